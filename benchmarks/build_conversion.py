@@ -0,0 +1,116 @@
+"""Measures the cost of converting builds between their representations, and the memory used per `Build` instance.
+
+Only the public API of `Build` is used, so the script can be run unchanged against older revisions to compare results.
+
+Usage:
+    python -m benchmarks.build_conversion [--builds N] [--repeat N]
+
+Results with the default 10000 builds, best of 5 runs, on CPython 3.12.1 (x86_64, single core), before and after
+`Build.as_dict` and `Build.from_dict` iterated a fixed tuple of attribute names instead of scanning `dir()` on every
+call, and `Build` got `__slots__` instead of a per-instance `__dict__`:
+
+                     before       after
+    from_json      11.35 µs     9.32 µs
+    as_dict        48.85 µs     5.11 µs
+    from_dict      49.06 µs     8.09 µs
+    update_local    1.80 µs     0.84 µs
+    memory        1641 B/build  297 B/build
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from database.builds import Build
+
+
+def make_build_json(build_id: int) -> dict[str, Any]:
+    """Creates a build row as returned by PostgREST when selecting `all_build_columns`."""
+    return {
+        "id": build_id,
+        "submission_status": 1,
+        "record_category": None,
+        "category": "Door",
+        "width": 6,
+        "height": 5,
+        "depth": 4,
+        "information": {"user": "A fast piston door."},
+        "server_info": {"server_ip": "mc.example.com", "coordinates": "0 64 0", "command_to_build": None},
+        "submitter_id": 1234567890,
+        "completion_time": "2024",
+        "edited_time": "2026-01-01T00:00:00",
+        "doors": {
+            "orientation": "Door",
+            "door_width": 2,
+            "door_height": 2,
+            "door_depth": 1,
+            "normal_opening_time": 600,
+            "normal_closing_time": 600,
+            "visible_opening_time": 400,
+            "visible_closing_time": 400,
+        },
+        "types": [{"name": "Regular"}],
+        "restrictions": [
+            {"name": "Seamless", "type": "wiring-placement"},
+            {"name": "No Observers", "type": "component"},
+            {"name": "Locational", "type": "miscellaneous"},
+        ],
+        "users": [{"id": build_id % 100, "ign": f"player{build_id % 100}"}],
+        "versions": [{"full_name_temp": "Java 1.20"}, {"full_name_temp": "Java 1.21"}],
+        "build_links": [
+            {"url": f"https://example.com/{build_id}.png", "media_type": "image"},
+            {"url": f"https://example.com/{build_id}.mp4", "media_type": "video"},
+        ],
+    }
+
+
+def time_per_build(func: Callable[[Any], object], items: list[Any], repeat: int) -> float:
+    """Returns the best time (in microseconds) to call `func` on one item."""
+    best = min(timeit.repeat(lambda: [func(item) for item in items], number=1, repeat=repeat))
+    return best / len(items) * 1e6
+
+
+def memory_per_build(rows: list[dict[str, Any]]) -> float:
+    """Returns the number of bytes allocated per `Build` created with `from_dict`, excluding the attribute values."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    builds = [Build.from_dict(row) for row in rows]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_build = (after - before) / len(builds)
+    del builds
+    return per_build
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--builds", type=int, default=10_000, help="Number of builds to convert per run")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the best run is reported")
+    args = parser.parse_args()
+
+    raw = [make_build_json(build_id) for build_id in range(1, args.builds + 1)]
+    builds = [Build.from_json(row) for row in raw]
+    dicts = [build.as_dict() for build in builds]
+    update = {"width": 7, "door_type": ["Funnel"], "image_urls": ["https://example.com/new.png"]}
+
+    results = {
+        "from_json": time_per_build(Build.from_json, raw, args.repeat),
+        "as_dict": time_per_build(Build.as_dict, builds, args.repeat),
+        "from_dict": time_per_build(Build.from_dict, dicts, args.repeat),
+        "update_local": time_per_build(lambda build: build.update_local(update), builds, args.repeat),
+    }
+
+    print(f"{args.builds} builds, best of {args.repeat} runs")
+    for name, micros in results.items():
+        print(f"{name:>14}: {micros:8.2f} µs/build")
+    print(f"{'memory':>14}: {memory_per_build(dicts):8.0f} bytes/build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Measures the throughput of decoding PostgREST build payloads into `Build` objects.
+
+Compares the generic path (parse the body into dicts, then `Build.from_json`) with the typed path
+(`decode_build_rows`, then `Build.from_row`), on a single response body containing all the synthetic builds.
+
+Usage:
+    python -m benchmarks.build_decoding [--builds N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from collections.abc import Callable
+
+from benchmarks.build_conversion import make_build_json
+from database.build_rows import decode_build_rows
+from database.builds import Build
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Returns the best time (in seconds) of `repeat` calls to `func`."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--builds", type=int, default=10_000, help="Number of builds in the response body")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs, the best run is reported")
+    args = parser.parse_args()
+
+    body = json.dumps([make_build_json(build_id) for build_id in range(1, args.builds + 1)]).encode()
+
+    results = {
+        "json.loads": best_time(lambda: json.loads(body), args.repeat),
+        "json + from_json": best_time(lambda: [Build.from_json(row) for row in json.loads(body)], args.repeat),
+        "decode_build_rows": best_time(lambda: decode_build_rows(body), args.repeat),
+        "decode + from_row": best_time(lambda: [Build.from_row(row) for row in decode_build_rows(body)], args.repeat),
+    }
+
+    print(f"{args.builds} builds ({len(body) / 1e6:.1f} MB), best of {args.repeat} runs")
+    for name, seconds in results.items():
+        print(f"{name:>18}: {seconds * 1e3:8.1f} ms {args.builds / seconds:12,.0f} builds/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Fixtures for the database benchmarks, which run against `FakePostgrest` instead of a Supabase project."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any, cast
+
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest, connect, disconnect, reset_caches, unload_tables
+from database.message import load_message_index
+from database.server_settings import load_server_settings
+
+BENCHMARK_SERVERS = 3
+"""The number of servers in the fake database."""
+
+_round_trips: dict[str, float] = {}
+"""The average number of round trips per call of each benchmark, shown at the end of the run."""
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("fake-postgrest", "fake PostgREST backend")
+    group.addoption(
+        "--postgrest-latency",
+        type=float,
+        default=2.0,
+        help="Latency (in milliseconds) of every request to the fake PostgREST. Default: 2.0",
+    )
+    group.addoption(
+        "--postgrest-builds",
+        type=int,
+        default=500,
+        help="Number of builds in the fake database. Default: 500",
+    )
+
+
+def pytest_terminal_summary(terminalreporter: Any) -> None:
+    if not _round_trips:
+        return
+    terminalreporter.section("database round trips per call")
+    for name, round_trips in sorted(_round_trips.items()):
+        terminalreporter.write_line(f"{name:<48} {round_trips:8.2f}")
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    event_loop = asyncio.new_event_loop()
+    yield event_loop
+    event_loop.close()
+
+
+@pytest.fixture
+def postgrest(request: pytest.FixtureRequest, loop: asyncio.AbstractEventLoop) -> Iterator[FakePostgrest]:
+    """A seeded fake PostgREST that `DatabaseManager` is connected to, with the server settings and message index
+    loaded like at bot startup. Half of the builds are already posted in every server."""
+    builds = cast(int, request.config.getoption("--postgrest-builds"))
+    latency_ms = cast(float, request.config.getoption("--postgrest-latency"))
+    fake = FakePostgrest(latency=latency_ms / 1000)
+    fake.seed(builds, servers=BENCHMARK_SERVERS, messages_per_server=builds // 2)
+    client = loop.run_until_complete(connect(fake))
+    reset_caches()
+    loop.run_until_complete(load_server_settings())
+    loop.run_until_complete(load_message_index())
+    yield fake
+    loop.run_until_complete(client.aclose())
+    disconnect()
+    reset_caches()
+    unload_tables()
+
+
+@pytest.fixture
+def measure(
+    request: pytest.FixtureRequest, benchmark: Any, postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop
+) -> Callable[..., None]:
+    """Benchmarks a coroutine function, reporting its wall time and the number of round trips to the database.
+
+    Call it with the coroutine function, and optionally a `setup` function that is called (untimed) before every round
+    and a number of `rounds`. The setup must not make requests, or they are counted as round trips.
+    """
+
+    def run(
+        func: Callable[[], Awaitable[object]], *, setup: Callable[[], None] = reset_caches, rounds: int = 20
+    ) -> None:
+        calls = 0
+        before = postgrest.round_trips
+
+        def call() -> None:
+            nonlocal calls
+            calls += 1
+            loop.run_until_complete(func())
+
+        # With --benchmark-disable, pedantic calls the function only once
+        benchmark.pedantic(call, setup=setup, rounds=rounds, iterations=1)
+        round_trips = (postgrest.round_trips - before) / calls
+        benchmark.extra_info["round_trips"] = round_trips
+        benchmark.extra_info["latency_ms"] = postgrest.latency * 1000
+        _round_trips[request.node.name] = round_trips
+
+    return run
@@ -0,0 +1,307 @@
+"""An in-process stand-in for PostgREST, so the database layer can be benchmarked without a Supabase project.
+
+`FakePostgrest` is an httpx transport that keeps the tables in memory and implements the subset of the PostgREST API
+used by the `database` package: selects with `eq`/`neq`/`gt`/`gte`/`lt`/`lte`/`in`/`is` filters, `order`, `limit`,
+`offset` and exact counts, inserts, upserts, updates and deletes that return the affected rows, and the `upsert_build`,
+`get_unsent_builds` and `get_outdated_messages` functions. Builds are stored in the shape PostgREST returns them when
+selecting `all_build_columns` (see `make_build_json`), and the select list of builds is ignored.
+
+Every request waits for `latency` seconds before it is answered, and is counted in `round_trips`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import operator
+from collections.abc import Callable
+from typing import Any, cast, override
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+import database.message
+from benchmarks.build_conversion import make_build_json
+from database.builds import build_cache, embed_cache
+from database.database import DatabaseManager
+from database.metrics import InstrumentedTransport
+from database.reference_data import invalidate_reference_data
+from database.server_settings import invalidate_server_settings
+from database.user import forget_all_users
+
+FAKE_POSTGREST_URL = "http://postgrest.invalid/rest/v1"
+
+PRIMARY_KEYS = {"messages": "message_id", "server_settings": "server_id", "backfill_jobs": "server_id"}
+"""The primary key of each table, if it is not `id`."""
+
+TEXT_COLUMNS = {"messages": frozenset({"message_id", "channel_id"})}
+"""Columns that hold ids but are of type text, so PostgREST returns them as strings."""
+
+EMBEDDED_BUILD_TABLES = frozenset({"doors", "types", "restrictions", "users", "versions", "build_links"})
+"""The related tables embedded in the stored builds, which functions returning `setof builds` leave out."""
+
+_MODIFIER_PARAMS = frozenset({"select", "order", "limit", "offset", "columns", "on_conflict"})
+"""Query parameters that are not filters."""
+
+Row = dict[str, Any]
+
+
+def _parse_value(raw: str, like: Any) -> Any:
+    """Converts a filter value to the type of the column value it is compared with."""
+    raw = raw.strip('"')
+    if raw == "null":
+        return None
+    if isinstance(like, bool):
+        return raw == "true"
+    if isinstance(like, int):
+        return int(raw)
+    if isinstance(like, float):
+        return float(raw)
+    return raw
+
+
+_COMPARISONS: dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def _compile_filter(column: str, expression: str) -> Callable[[Row], bool]:
+    """Compiles a PostgREST filter like `eq.5` or `in.(1,2,3)` into a predicate on rows.
+
+    The filter is parsed once per request rather than once per row, so that the cost of the fake does not swamp the
+    cost of the code being benchmarked."""
+    op, _, raw = expression.partition(".")
+    if op == "is":
+        expected = None if raw == "null" else raw == "true"
+        return lambda row: row.get(column) is expected
+    if op == "in":
+        items = [item for item in raw.strip("()").split(",") if item]
+        by_type: dict[type, set[Any]] = {}
+
+        def is_in(row: Row) -> bool:
+            value = row.get(column)
+            if type(value) not in by_type:
+                by_type[type(value)] = {_parse_value(item, value) for item in items}
+            return value in by_type[type(value)]
+
+        return is_in
+    if op not in _COMPARISONS:
+        raise NotImplementedError(f"Unsupported filter operator: {op}")
+    compare = _COMPARISONS[op]
+
+    def matches(row: Row) -> bool:
+        value = row.get(column)
+        return value is not None and compare(value, _parse_value(raw, value))
+
+    return matches
+
+
+class FakePostgrest(httpx.AsyncBaseTransport):
+    """Serves PostgREST requests from in-memory tables, after an injected latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        """How long (in seconds) every request takes."""
+        self.tables: dict[str, list[Row]] = {}
+        self.round_trips = 0
+        self._next_ids: dict[str, int] = {}
+        self._functions: dict[str, Callable[[dict[str, Any]], list[Row]]] = {
+            "upsert_build": self._upsert_build,
+            "get_unsent_builds": self._get_unsent_builds,
+            "get_outdated_messages": self._get_outdated_messages,
+        }
+
+    def seed(self, builds: int, servers: int = 1, messages_per_server: int = 0) -> None:
+        """Fills the tables with synthetic builds, users, server settings and messages.
+
+        Args:
+            builds: The number of builds, with ids from 1.
+            servers: The number of servers, with ids from 1.
+            messages_per_server: The number of builds (starting from the first) already posted in each server.
+        """
+        self.tables["builds"] = [make_build_json(build_id) for build_id in range(1, builds + 1)]
+        self.tables["users"] = [{"id": i, "ign": f"player{i}", "discord_id": None} for i in range(100)]
+        self.tables["server_settings"] = [
+            {"server_id": server_id, "builds_channel_id": 1000 + server_id, "voting_channel_id": 2000 + server_id}
+            for server_id in range(1, servers + 1)
+        ]
+        self.tables["messages"] = [
+            {
+                "server_id": server_id,
+                "build_id": build_id,
+                "channel_id": str(1000 + server_id),
+                "message_id": str(server_id * 1_000_000 + build_id),
+                "edited_time": "2026-01-01T00:00:00",
+                "purpose": "build_post",
+            }
+            for server_id in range(1, servers + 1)
+            for build_id in range(1, min(builds, messages_per_server) + 1)
+        ]
+
+    def _table(self, name: str) -> list[Row]:
+        return self.tables.setdefault(name, [])
+
+    @staticmethod
+    def _as_stored(table: str, row: Row) -> Row:
+        """Converts the values of text columns to strings, as Postgres does when the row is written."""
+        text_columns = TEXT_COLUMNS.get(table, frozenset())
+        return {key: str(value) if key in text_columns and value is not None else value for key, value in row.items()}
+
+    def _primary_key(self, table: str) -> str:
+        return PRIMARY_KEYS.get(table, "id")
+
+    def _insert(self, table: str, row: Row) -> Row:
+        row = self._as_stored(table, row)
+        key = self._primary_key(table)
+        if row.get(key) is None:
+            next_id = self._next_ids.get(table) or max((r.get(key) or 0 for r in self._table(table)), default=0) + 1
+            self._next_ids[table] = next_id + 1
+            row = {**row, key: next_id}
+        self._table(table).append(row)
+        return row
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.url.path.removeprefix(httpx.URL(FAKE_POSTGREST_URL).path).strip("/")
+        await request.aread()
+        body: Any = json.loads(request.content) if request.content else None
+        filters = [
+            _compile_filter(column, expression)
+            for column, expression in request.url.params.multi_items()
+            if column not in _MODIFIER_PARAMS
+        ]
+        prefer = request.headers.get("prefer", "")
+
+        if path.startswith("rpc/"):
+            function = self._functions.get(path.removeprefix("rpc/"))
+            if function is None:
+                return httpx.Response(404, json={"message": f"Unknown function {path}", "code": "PGRST202"})
+            return self._respond(function(body or {}))
+
+        table = self._table(path)
+        matching = [row for row in table if all(predicate(row) for predicate in filters)]
+        match request.method:
+            case "GET" | "HEAD":
+                return self._select(path, matching, request.url.params, prefer)
+            case "POST":
+                rows = cast(list[Row], body if isinstance(body, list) else [body])
+                if "resolution=merge-duplicates" in prefer:
+                    return self._respond([self._upsert(path, row) for row in rows])
+                return self._respond([self._insert(path, row) for row in rows])
+            case "PATCH":
+                for row in matching:
+                    row.update(self._as_stored(path, body))
+                return self._respond(matching, total=len(matching) if "count=exact" in prefer else None)
+            case "DELETE":
+                deleted = {id(row) for row in matching}
+                table[:] = [row for row in table if id(row) not in deleted]
+                return self._respond(matching, total=len(matching) if "count=exact" in prefer else None)
+        return httpx.Response(405, json={"message": f"Unsupported method {request.method}"})
+
+    def _select(self, table: str, rows: list[Row], params: httpx.QueryParams, prefer: str) -> httpx.Response:
+        if order := params.get("order"):
+            for term in reversed(order.split(",")):
+                column, _, direction = term.partition(".")
+                rows = sorted(rows, key=lambda row: row[column], reverse=direction.startswith("desc"))
+        total = len(rows)
+        offset = int(params.get("offset", 0))
+        rows = rows[offset:]
+        if (limit := params.get("limit")) is not None:
+            rows = rows[: int(limit)]
+
+        columns = params.get("select", "*")
+        if table != "builds" and columns != "*":
+            names = [name.strip() for name in columns.split(",")]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return self._respond(rows, offset, total if "count=exact" in prefer else None)
+
+    def _upsert(self, table: str, row: Row) -> Row:
+        row = self._as_stored(table, row)
+        key = self._primary_key(table)
+        for existing in self._table(table):
+            if row.get(key) is not None and existing.get(key) == row[key]:
+                existing.update(row)
+                return existing
+        return self._insert(table, row)
+
+    @staticmethod
+    def _respond(rows: list[Row], offset: int = 0, total: int | None = None) -> httpx.Response:
+        row_range = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+        headers = {"content-range": f"{row_range}/{'*' if total is None else total}"}
+        return httpx.Response(200, json=rows, headers=headers)
+
+    def _upsert_build(self, params: dict[str, Any]) -> list[Row]:
+        data: dict[str, Any] = params["build_data"]
+        builds = self._table("builds")
+        existing = next((row for row in builds if row["id"] == data.get("id")), None)
+        if existing is None:
+            existing = self._insert("builds", {**make_build_json(0), "id": None})
+            existing.update(make_build_json(existing["id"]))
+        # Only the columns of the builds table are stored, the related tables keep their synthetic rows
+        existing.update({key: value for key, value in data.items() if key in existing and not isinstance(value, list)})
+        return [{"id": existing["id"], "information": existing["information"]}]
+
+    def _get_unsent_builds(self, params: dict[str, Any]) -> list[Row]:
+        server_id = params["server_id_input"]
+        sent = {row["build_id"] for row in self._table("messages") if row["server_id"] == server_id}
+        return [
+            {column: value for column, value in row.items() if column not in EMBEDDED_BUILD_TABLES}
+            for row in self._table("builds")
+            if row["id"] not in sent and row["submission_status"] == 1
+        ]
+
+    def _get_outdated_messages(self, params: dict[str, Any]) -> list[Row]:
+        server_id = params["server_id_input"]
+        edited_times = {row["id"]: row["edited_time"] for row in self._table("builds")}
+        outdated = [
+            row
+            for row in self._table("messages")
+            if row["server_id"] == server_id and row["edited_time"] < (edited_times.get(row["build_id"]) or "")
+        ]
+        return sorted(outdated, key=lambda row: row["edited_time"])
+
+
+async def connect(fake: FakePostgrest) -> AsyncPostgrestClient:
+    """Points `DatabaseManager` at a fake PostgREST, with the same metrics instrumentation as the real client."""
+    client = AsyncPostgrestClient(FAKE_POSTGREST_URL)
+    default_session = client.session
+    client.session = httpx.AsyncClient(
+        base_url=FAKE_POSTGREST_URL, headers=default_session.headers, transport=InstrumentedTransport(fake)
+    )
+    await default_session.aclose()
+    # The client has the same table() and rpc() methods as the Supabase client, which is all the database layer uses
+    DatabaseManager._async_client = client  # type: ignore[assignment]
+    DatabaseManager._is_setup = True
+    return client
+
+
+def disconnect() -> None:
+    """Undoes `connect`."""
+    DatabaseManager._async_client = None
+    DatabaseManager._is_setup = False
+
+
+def reset_caches() -> None:
+    """Drops the caches that fill up while the bot runs, so that benchmarks measure the database round trips.
+
+    The server settings and the message index stay loaded, as they are loaded once at startup."""
+    build_cache.clear()
+    embed_cache.clear()
+    invalidate_reference_data()
+    forget_all_users()
+
+
+def unload_tables() -> None:
+    """Drops the in-memory copies of the tables that are loaded at startup."""
+    invalidate_server_settings()
+    database.message._message_index.clear()  # pyright: ignore[reportPrivateUsage]
+    database.message._is_loaded = False  # pyright: ignore[reportPrivateUsage]
@@ -0,0 +1,122 @@
+"""Benchmarks of the database layer against a fake PostgREST (see `benchmarks.fake_postgrest`).
+
+Every benchmark reports its wall time, and the number of round trips to the database per call is shown at the end of
+the run and saved in the `extra_info` of `--benchmark-json`. With the default latency of 2 ms per request, the wall
+time is dominated by the round trips, so a change that saves a query shows up clearly. Run with
+`--postgrest-latency 0` to measure the local overhead (building queries, decoding rows) on its own.
+
+Usage:
+    python -m pytest benchmarks [--postgrest-latency MS] [--postgrest-builds N] [--benchmark-json FILE]
+"""
+
+from __future__ import annotations
+
+import itertools
+from collections.abc import Callable
+
+from benchmarks.build_conversion import make_build_json
+from benchmarks.fake_postgrest import FakePostgrest, reset_caches
+from database import message as msg
+from database.builds import Build, get_all_builds, get_builds, get_unsent_builds, iter_builds
+
+MESSAGE_BATCH_SIZE = 20
+"""The number of messages written per call in the message benchmarks, about one per server the bot is in."""
+
+
+def build_ids(postgrest: FakePostgrest) -> list[int]:
+    return [row["id"] for row in postgrest.tables["builds"]]
+
+
+def test_build_load(measure: Callable[..., None]):
+    async def load():
+        build = Build()
+        build.id = 1
+        await build.load()
+
+    measure(load)
+
+
+def test_build_save_existing(measure: Callable[..., None]):
+    build = Build.from_json(make_build_json(1))
+    measure(build.save)
+
+
+def test_build_save_new(measure: Callable[..., None]):
+    build = Build.from_json(make_build_json(1))
+
+    def setup():
+        reset_caches()
+        build.id = None
+
+    measure(build.save, setup=setup)
+
+
+def test_get_all_builds(measure: Callable[..., None]):
+    measure(get_all_builds, rounds=5)
+
+
+def test_iter_builds(measure: Callable[..., None]):
+    async def iterate():
+        return [build async for build in iter_builds()]
+
+    measure(iterate, rounds=5)
+
+
+def test_get_builds(measure: Callable[..., None], postgrest: FakePostgrest):
+    ids = build_ids(postgrest)
+    measure(lambda: get_builds(ids), rounds=5)
+
+
+def test_get_unsent_builds(measure: Callable[..., None]):
+    measure(lambda: get_unsent_builds(1), rounds=5)
+
+
+def test_get_unsent_builds_by_id(measure: Callable[..., None]):
+    measure(lambda: msg.get_unsent_builds(1), rounds=5)
+
+
+def test_get_unsent_build_ids(measure: Callable[..., None]):
+    measure(lambda: msg.get_unsent_build_ids(1))
+
+
+def test_load_message_index(measure: Callable[..., None]):
+    measure(msg.load_message_index, rounds=5)
+
+
+def test_get_build_messages(measure: Callable[..., None]):
+    measure(lambda: msg.get_build_messages(1))
+
+
+def test_get_outdated_messages(measure: Callable[..., None]):
+    measure(lambda: msg.get_outdated_messages(1))
+
+
+def test_add_messages(measure: Callable[..., None]):
+    message_ids = itertools.count(10_000_000_000)
+
+    async def add():
+        rows = [(server_id, 1000, next(message_ids)) for server_id in range(MESSAGE_BATCH_SIZE)]
+        await msg.add_messages(1, rows, "build_post")
+
+    measure(add)
+
+
+def test_update_messages_edited_time(measure: Callable[..., None], postgrest: FakePostgrest):
+    message_ids = [int(row["message_id"]) for row in postgrest.tables["messages"][:MESSAGE_BATCH_SIZE]]
+    measure(lambda: msg.update_messages_edited_time(message_ids))
+
+
+def test_delete_messages(measure: Callable[..., None], postgrest: FakePostgrest):
+    rows = [dict(row) for row in postgrest.tables["messages"][:MESSAGE_BATCH_SIZE]]
+    message_ids = [int(row["message_id"]) for row in rows]
+
+    def setup():
+        # Put the deleted messages back without a request, so every round deletes the same messages
+        messages = postgrest.tables["messages"]
+        present = {row["message_id"] for row in messages}
+        for row in rows:
+            if row["message_id"] not in present:
+                messages.append(dict(row))
+            msg.remember_message(dict(row))  # pyright: ignore[reportArgumentType]
+
+    measure(lambda: msg.delete_messages(message_ids), setup=setup)
@@ -16,6 +16,12 @@ FORM_LINK = "https://forms.gle/i9Nf6apGgPGTUohr9"
 # Whether to print tracebacks directly to the user, may leak system information
 PRINT_TRACEBACKS = True
 
+# The number of database queries a command or listener may make before a warning is logged.
+# A command can set its own budget with extras={"query_budget": n}.
+DEFAULT_QUERY_BUDGET = 25
+# Whether exceeding a query budget raises QueryBudgetExceeded instead of logging a warning, for tests
+STRICT_QUERY_BUDGETS = False
+
 # List of versions for version string parser
 VERSIONS_LIST = [
     "Pre 1.5",
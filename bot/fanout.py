@@ -0,0 +1,107 @@
+"""Runs the same Discord request against many channels (or messages) concurrently.
+
+discord.py already queues requests that share a rate limit bucket and waits out 429 responses. Sending or editing a
+message is bucketed per channel, so requests to different channels do not wait on each other. At most
+`MAX_CONCURRENT_DISCORD_REQUESTS` requests run at a time, which keeps the bot well below the global rate limit, and a
+fan-out takes about as long as the slowest channel instead of the sum of all channels.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from typing import TypeVar
+
+import discord
+
+from bot._types import GuildMessageable
+
+MAX_CONCURRENT_DISCORD_REQUESTS = 8
+"""The maximum number of Discord requests a single fan-out has in flight at a time."""
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+async def fan_out(
+    keys: Iterable[K],
+    action: Callable[[K], Awaitable[T]],
+    *,
+    limit: int = MAX_CONCURRENT_DISCORD_REQUESTS,
+) -> tuple[dict[K, T], dict[K, Exception]]:
+    """Calls `action` once for each unique key, with at most `limit` calls running at a time.
+
+    A failing call does not cancel the others.
+
+    Args:
+        keys: The keys to call `action` with. Duplicates are only called once.
+        action: The coroutine function to call.
+        limit: The maximum number of concurrent calls.
+
+    Returns:
+        The results and the exceptions raised, both keyed by the key they were called with.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    results: dict[K, T] = {}
+    errors: dict[K, Exception] = {}
+
+    async def run(key: K) -> None:
+        async with semaphore:
+            try:
+                results[key] = await action(key)
+            except Exception as e:
+                errors[key] = e
+
+    await asyncio.gather(*(run(key) for key in dict.fromkeys(keys)))
+    return results, errors
+
+
+async def send_to_channels(
+    bot: discord.Client, channel_ids: Iterable[int], *, embed: discord.Embed
+) -> list[discord.Message]:
+    """Sends an embed to many channels concurrently, see `fan_out`.
+
+    Channels that cannot be found or fail to receive the message are logged and skipped.
+
+    Returns:
+        The messages that were sent.
+    """
+
+    async def send(channel_id: int) -> discord.Message:
+        channel = bot.get_channel(channel_id)
+        if not isinstance(channel, GuildMessageable):
+            raise ValueError(f"Channel {channel_id} is not a guild text channel the bot can see.")
+        return await channel.send(embed=embed)
+
+    messages, errors = await fan_out(channel_ids, send)
+    for channel_id, error in errors.items():
+        logger.warning("Failed to send a message to channel %s", channel_id, exc_info=error)
+    return list(messages.values())
+
+
+async def edit_messages(bot: discord.Client, messages: Iterable[tuple[int, int]], *, embed: discord.Embed) -> list[int]:
+    """Edits the embed of many messages concurrently, see `fan_out`.
+
+    The messages are edited through partial messages, so they are not fetched first. Messages that fail to be edited
+    (e.g. because they were deleted) are logged and skipped.
+
+    Args:
+        bot: The bot that sent the messages.
+        messages: The (channel_id, message_id) of each message.
+        embed: The new embed.
+
+    Returns:
+        The ids of the messages that were edited.
+    """
+
+    async def edit(message: tuple[int, int]) -> None:
+        channel_id, message_id = message
+        await bot.get_partial_messageable(channel_id).get_partial_message(message_id).edit(embed=embed)
+
+    edited, errors = await fan_out(messages, edit)
+    for (channel_id, message_id), error in errors.items():
+        logger.warning("Failed to edit message %s in channel %s", message_id, channel_id, exc_info=error)
+    return [message_id for _, message_id in edited]
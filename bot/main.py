@@ -9,14 +9,23 @@ from collections.abc import Iterable
 from typing import override, TYPE_CHECKING, Callable, ParamSpec, TypeVar, Awaitable
 
 import discord
+from aiohttp import web
 from discord import User, Message
 from discord.ext import commands
 from discord.ext.commands import Cog, Bot, Context, CommandError
 from dotenv import load_dotenv
 
 from bot.submission.submit import SubmissionsCog
+from bot.submission.reconciler import ReconcilerCog
+from bot.submission.backfill import BackfillCog
 from bot.verify import VerifyCog
+from database.change_feed import ChangeFeed
 from database.database import DatabaseManager
+from database.server_settings import load_server_settings
+from database.message import load_message_index
+from database.query_budget import finish_query_budget, start_query_budget
+from bot.tracing import discord_trace_config, finish_trace, start_trace
+from bot.metrics_server import start_metrics_server
 from database.utils import utcnow
 from bot.config import OWNER_SERVER_ID, OWNER_ID, BOT_NAME, BOT_VERSION, PREFIX, DEV_MODE, DEV_PREFIX
 from bot.misc_commands import Miscellaneous
@@ -115,20 +124,59 @@ class RedstoneSquid(Bot):
             owner_id=OWNER_ID,
             intents=discord.Intents.all(),
             description=f"{BOT_NAME} v{BOT_VERSION}",
+            http_trace=discord_trace_config(),
         )
         assert self.owner_id is not None
+        self.change_feed: ChangeFeed | None = None
+        self.metrics_server: web.AppRunner | None = None
+        self.before_invoke(self.before_command)
+        self.after_invoke(self.after_command)
 
     @override
     async def setup_hook(self) -> None:
         await DatabaseManager.setup()
+        await load_server_settings()
+        await load_message_index()
         await self.add_cog(Miscellaneous(self))
         await self.add_cog(SettingsCog(self))
         await self.add_cog(SubmissionsCog(self))
+        await self.add_cog(ReconcilerCog(self))
+        await self.add_cog(BackfillCog(self))
         await self.add_cog(Listeners(self))
         await self.add_cog(HelpCog(self))
         await self.load_extension("jishaku")
         await self.add_cog(VerifyCog(self))
 
+        # Without a direct database connection, the caches only see the writes made by this process
+        if dsn := os.environ.get("SUPABASE_DB_URL"):
+            self.change_feed = ChangeFeed(dsn)
+            self.change_feed.start()
+
+        # The metrics are kept in memory, so only this process can serve the metrics of its own queries
+        if port := os.environ.get("METRICS_PORT"):
+            self.metrics_server = await start_metrics_server(int(port))
+
+    @staticmethod
+    async def before_command(ctx: Context[RedstoneSquid]) -> None:
+        """Starts tracing a command and counting its database queries, see `bot.tracing` and `database.query_budget`."""
+        assert ctx.command is not None
+        start_trace(ctx.command.qualified_name)
+        start_query_budget(ctx.command.qualified_name, ctx.command.extras.get("query_budget"))
+
+    @staticmethod
+    async def after_command(ctx: Context[RedstoneSquid]) -> None:
+        """Records the trace of a command, and warns if it made more database queries than its budget."""
+        finish_trace("CommandError" if ctx.command_failed else None)
+        finish_query_budget()
+
+    @override
+    async def close(self) -> None:
+        if self.change_feed is not None:
+            await self.change_feed.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.cleanup()
+        await super().close()
+
 
 async def main():
     """Main entry point for the bot."""
@@ -0,0 +1,36 @@
+"""Serves the database metrics of the bot process over HTTP, for Prometheus to scrape.
+
+The metrics live in the memory of the process that makes the queries, so they must be served by the bot itself rather
+than by api.py, which runs as a separate process. The endpoint is protected by the same secret as api.py's /verify.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+
+from aiohttp import web
+
+from database.metrics import format_prometheus
+
+
+async def get_metrics(request: web.Request) -> web.Response:
+    """Database query metrics of the bot, in the Prometheus text format."""
+    secret = os.environ.get("SYNERGY_SECRET")
+    if not secret or not hmac.compare_digest(request.headers.get("Authorization", ""), secret):
+        raise web.HTTPUnauthorized()
+    return web.Response(text=format_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    """Starts serving `/metrics` on the bot's event loop.
+
+    Returns:
+        The runner of the server, call its `cleanup` to stop it.
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", get_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
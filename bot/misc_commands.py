@@ -9,6 +9,8 @@ from discord.ext.commands import command, Context, Cog, Greedy, hybrid_command
 
 import bot.utils as utils
 from bot.config import SOURCE_CODE_URL, BOT_NAME, FORM_LINK
+from bot.tracing import format_trace, recent_traces, summarize_traces
+from database.metrics import query_stats
 
 if TYPE_CHECKING:
     from bot.main import RedstoneSquid
@@ -125,6 +127,39 @@ class Miscellaneous(Cog):
             "https://supabase.com/dashboard/project/jnushtruzgnnmmxabsxi/editor/29424?sort=submission_id%3Aasc"
         )
 
+    @command(name="dbstats", hidden=True)
+    @commands.is_owner()
+    async def db_stats(self, ctx: Context, limit: int = 15):
+        """Shows the slowest kinds of database queries made since the bot started."""
+        rows = sorted(query_stats.items(), key=lambda item: item[1].total_seconds, reverse=True)[:limit]
+        if not rows:
+            await ctx.send("No queries recorded yet.")
+            return
+
+        lines = [f"{'table':<24} {'op':<7} {'count':>6} {'p50':>6} {'p95':>6} {'max':>6} {'rows':>7} {'err':>4}"]
+        for (target, operation), stats in rows:
+            p50, p95, max_ms = stats.quantile(0.5) * 1000, stats.quantile(0.95) * 1000, stats.max_seconds * 1000
+            lines.append(
+                f"{target[:24]:<24} {operation:<7} {stats.count:>6} {p50:>4.0f}ms {p95:>4.0f}ms {max_ms:>4.0f}ms "
+                f"{stats.rows:>7} {stats.errors:>4}"
+            )
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+    @command(name="traces", hidden=True)
+    @commands.is_owner()
+    async def traces(self, ctx: Context, limit: int = 10):
+        """Shows where the time of recent commands went: D is the database, R is Discord and . is local work."""
+        if not recent_traces:
+            await ctx.send("No traces recorded yet.")
+            return
+
+        lines = summarize_traces(recent_traces)
+        lines.append("")
+        lines.extend(format_trace(t) for t in list(recent_traces)[-limit:])
+        text = "\n".join(lines)
+        # Discord messages are limited to 2000 characters
+        await ctx.send("```\n" + text[:1985] + "\n```")
+
     @command(name="error", aliases=["e"], hidden=True)
     @commands.is_owner()
     async def error(self, ctx: Context):
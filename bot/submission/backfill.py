@@ -0,0 +1,167 @@
+"""Background jobs that post every unsent build to a server, e.g. when the bot is set up in a new server.
+
+Builds are posted in chronological (id) order, one every `BACKFILL_POST_INTERVAL` seconds so that a backfill never
+competes with regular posts for the rate limits. Progress is checkpointed in the backfill_jobs table after every post,
+and running jobs are resumed when the bot restarts. Which builds still need to be posted is always read from the
+messages table, so a build that was posted right before a crash is not posted again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from typing import TYPE_CHECKING, cast, override
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import Cog, Context, group
+
+from bot import utils
+from database.backfill import (
+    checkpoint_backfill_job,
+    get_backfill_job,
+    get_backfill_jobs,
+    set_backfill_job_status,
+    start_backfill_job,
+)
+from database.message import get_unsent_build_ids, iter_unsent_builds
+
+if TYPE_CHECKING:
+    from bot.main import RedstoneSquid
+    from bot.submission.submit import SubmissionsCog
+
+BACKFILL_POST_INTERVAL = 2.0
+"""How long (in seconds) to wait between posting two builds."""
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillCog(Cog, name="Backfill", command_attrs=dict(hidden=True)):
+    """Posts all unsent builds to servers in the background."""
+
+    def __init__(self, bot: RedstoneSquid):
+        self.bot: RedstoneSquid = bot
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        self._resume_task: asyncio.Task[None] | None = None
+
+    @override
+    async def cog_load(self) -> None:
+        self._resume_task = asyncio.create_task(self.resume_jobs())
+
+    @override
+    async def cog_unload(self) -> None:
+        if self._resume_task is not None:
+            self._resume_task.cancel()
+        for task in self._tasks.values():
+            task.cancel()
+
+    async def resume_jobs(self) -> None:
+        """Resumes the jobs that were running when the bot stopped."""
+        await self.bot.wait_until_ready()
+        for job in await get_backfill_jobs("running"):
+            guild = self.bot.get_guild(job["server_id"])
+            if guild is not None:
+                self._start_task(guild)
+
+    async def start(self, guild: discord.Guild) -> int:
+        """Starts (or restarts) a backfill job for a server. Builds that were already posted are skipped.
+
+        Returns:
+            The number of builds that will be posted.
+        """
+        self.stop(guild.id)
+        total = len(await get_unsent_build_ids(guild.id))
+        await start_backfill_job(guild.id, total)
+        self._start_task(guild)
+        return total
+
+    def stop(self, guild_id: int) -> bool:
+        """Stops the running backfill task of a server, if any. Returns whether a task was stopped.
+
+        This does not change the status of the job, so a job that is stopped by shutting down the bot is resumed."""
+        task = self._tasks.pop(guild_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def _start_task(self, guild: discord.Guild) -> None:
+        # The job outlives the command that starts it, so it must not add to that command's trace or query budget
+        self._tasks[guild.id] = asyncio.create_task(self.run_job(guild), context=contextvars.Context())
+
+    async def run_job(self, guild: discord.Guild) -> None:
+        """Posts the unsent builds of a server until there are none left, checkpointing after every build."""
+        job = await get_backfill_job(guild.id)
+        if job is None or job["status"] != "running":
+            return
+        posted = job["posted"]
+        submissions = cast("SubmissionsCog", self.bot.get_cog("Submissions"))
+
+        try:
+            async for build in iter_unsent_builds(guild.id, after_build_id=job["last_build_id"]):
+                if build.id is None:
+                    continue
+                # Stopping the job must not separate a post from its row in the messages table
+                messages = await asyncio.shield(submissions.post_build(build, guilds=[guild]))
+                if messages:
+                    posted += 1
+                    await checkpoint_backfill_job(guild.id, build.id, posted)
+                else:
+                    # The build stays unsent in the messages table, so restarting the job tries it again
+                    logger.warning("Backfill of server %s could not post build %s", guild.id, build.id)
+                await asyncio.sleep(BACKFILL_POST_INTERVAL)
+        except Exception as e:
+            logger.exception("Backfill of server %s failed", guild.id)
+            await set_backfill_job_status(guild.id, "failed", repr(e))
+        else:
+            await set_backfill_job_status(guild.id, "done")
+        finally:
+            if self._tasks.get(guild.id) is asyncio.current_task():
+                del self._tasks[guild.id]
+
+    @group(name="backfill", invoke_without_command=True)
+    @commands.is_owner()
+    async def backfill_group(self, ctx: Context):
+        """Shows the progress of all backfill jobs."""
+        jobs = await get_backfill_jobs()
+        if not jobs:
+            await ctx.send(embed=utils.info_embed("Backfill", "No backfill jobs."))
+            return
+
+        em = utils.info_embed("Backfill", None)
+        for job in jobs:
+            guild = self.bot.get_guild(job["server_id"])
+            name = guild.name if guild is not None else str(job["server_id"])
+            value = f"{job['status']}: {job['posted']}/{job['total']} posted, last build {job['last_build_id']}"
+            if job["error"]:
+                value += f"\n{job['error']}"
+            em.add_field(name=name, value=value, inline=False)
+        await ctx.send(embed=em)
+
+    @backfill_group.command(name="start")
+    @commands.is_owner()
+    async def start_command(self, ctx: Context, guild_id: int | None = None):
+        """Posts all unsent builds to a server (default: this one) in the background."""
+        guild = self.bot.get_guild(guild_id) if guild_id is not None else ctx.guild
+        if guild is None:
+            await ctx.send(embed=utils.error_embed("Error", "Unknown server."))
+            return
+        total = await self.start(guild)
+        await ctx.send(embed=utils.info_embed("Backfill", f"Posting {total} builds to {guild.name} in the background."))
+
+    @backfill_group.command(name="stop")
+    @commands.is_owner()
+    async def stop_command(self, ctx: Context, guild_id: int | None = None):
+        """Pauses the backfill job of a server (default: this one)."""
+        guild_id = guild_id if guild_id is not None else (ctx.guild.id if ctx.guild else None)
+        if guild_id is None or not self.stop(guild_id):
+            await ctx.send(embed=utils.error_embed("Error", "No backfill job is running for that server."))
+            return
+        await set_backfill_job_status(guild_id, "paused")
+        await ctx.send(embed=utils.info_embed("Backfill", "Backfill paused."))
+
+
+async def setup(bot: RedstoneSquid):
+    """Called by discord.py when the cog is added to the bot via bot.load_extension."""
+    await bot.add_cog(BackfillCog(bot))
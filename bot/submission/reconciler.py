@@ -0,0 +1,166 @@
+"""A background task that brings outdated build posts back in line with the database.
+
+Editing a build updates its posts right away (see `SubmissionsCog.update_build_messages`), but if that fails halfway
+the remaining posts keep showing the old revision. This task periodically asks the database for posts that are older
+than their build and re-renders them, spending at most `RECONCILE_BUDGET_PER_TICK` Discord requests per tick so that
+a large backlog (e.g. after a version bump) is worked through gradually instead of hitting the rate limits.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING, override
+
+import discord
+from discord.ext import commands, tasks
+from discord.ext.commands import Cog, Context, command
+
+from bot import utils
+from bot.fanout import fan_out
+from database import message as msg
+from database.builds import get_builds
+from database.schema import MessageRecord
+
+if TYPE_CHECKING:
+    from bot.main import RedstoneSquid
+
+RECONCILE_INTERVAL = 5 * 60
+"""How often (in seconds) to look for outdated posts."""
+RECONCILE_BUDGET_PER_TICK = 50
+"""The maximum number of posts edited per tick, across all guilds."""
+
+logger = logging.getLogger(__name__)
+
+
+class ReconcilerStats:
+    """Progress counters of the reconciler, since the bot started."""
+
+    def __init__(self):
+        self.ticks = 0
+        self.ticks_over_budget = 0
+        """Ticks that found more outdated posts than the budget allowed to edit."""
+        self.edited = 0
+        self.failed = 0
+        """Posts that could not be rendered or edited. Each is counted once, as it is skipped afterwards."""
+        self.forgotten = 0
+        """Posts that were deleted on discord, and so removed from the database."""
+        self.backlog = 0
+        """The number of outdated posts left after the last tick."""
+        self.last_tick_duration: float | None = None
+        self.last_error: str | None = None
+
+    def as_fields(self) -> dict[str, str]:
+        """The counters as embed fields."""
+        return {
+            "Ticks": str(self.ticks),
+            "Ticks over budget": str(self.ticks_over_budget),
+            "Edited": str(self.edited),
+            "Failed": str(self.failed),
+            "Forgotten": str(self.forgotten),
+            "Backlog": str(self.backlog),
+            "Last tick": "-" if self.last_tick_duration is None else f"{self.last_tick_duration:.2f}s",
+            "Last error": self.last_error or "-",
+        }
+
+
+class ReconcilerCog(Cog, command_attrs=dict(hidden=True)):
+    """Keeps build posts up to date in the background."""
+
+    def __init__(self, bot: RedstoneSquid):
+        self.bot: RedstoneSquid = bot
+        self.stats = ReconcilerStats()
+        self._skipped: set[int] = set()
+        """Posts that failed, left alone until the bot restarts. Outdated posts are handled oldest first, so a post that
+        fails on every tick would otherwise head every batch and use up the budget for good."""
+
+    @override
+    async def cog_load(self) -> None:
+        self.reconcile.start()
+
+    @override
+    async def cog_unload(self) -> None:
+        self.reconcile.cancel()
+
+    @tasks.loop(seconds=RECONCILE_INTERVAL)
+    async def reconcile(self) -> None:
+        """Edits outdated posts in every guild, up to the per-tick budget."""
+        start = time.perf_counter()
+        try:
+            await self.reconcile_once(RECONCILE_BUDGET_PER_TICK)
+        except Exception as e:
+            # An uncaught exception would stop the loop for good
+            self.stats.last_error = repr(e)
+            logger.exception("Failed to reconcile outdated build posts")
+        self.stats.ticks += 1
+        self.stats.last_tick_duration = time.perf_counter() - start
+
+    @reconcile.before_loop
+    async def before_reconcile(self) -> None:
+        await self.bot.wait_until_ready()
+
+    async def reconcile_once(self, budget: int) -> None:
+        """Edits at most `budget` outdated posts, the ones that have been outdated the longest first in each guild."""
+        outdated: list[MessageRecord] = []
+        for guild in self.bot.guilds:
+            guild_outdated = await msg.get_outdated_messages(guild.id) or []
+            outdated.extend(message for message in guild_outdated if message["message_id"] not in self._skipped)
+
+        batch = outdated[:budget]
+        self.stats.backlog = len(outdated) - len(batch)
+        if self.stats.backlog:
+            self.stats.ticks_over_budget += 1
+        if not batch:
+            return
+
+        build_ids = list(dict.fromkeys(message["build_id"] for message in batch))
+        embeds: dict[int, discord.Embed] = {}
+        for build in await get_builds(build_ids, profile="embed"):
+            if build is None or build.id is None:
+                continue
+            try:
+                embeds[build.id] = build.generate_embed()
+            except Exception:
+                # e.g. a build that is not a door, or is missing the fields its title needs
+                logger.exception("Failed to render build %s, skipping its outdated posts", build.id)
+
+        posts = {message["message_id"]: message for message in batch if message["build_id"] in embeds}
+        self._skip([message["message_id"] for message in batch if message["message_id"] not in posts])
+
+        async def edit(message_id: int) -> None:
+            post = posts[message_id]
+            partial = self.bot.get_partial_messageable(post["channel_id"]).get_partial_message(message_id)
+            await partial.edit(embed=embeds[post["build_id"]])
+
+        edited, errors = await fan_out(posts, edit)
+        await msg.update_messages_edited_time(list(edited))
+
+        gone = [message_id for message_id, error in errors.items() if isinstance(error, discord.NotFound)]
+        await msg.delete_messages(gone)
+        for message_id, error in errors.items():
+            if not isinstance(error, discord.NotFound):
+                logger.warning("Failed to edit outdated post %s, skipping it", message_id, exc_info=error)
+        self._skip([message_id for message_id, error in errors.items() if not isinstance(error, discord.NotFound)])
+
+        self.stats.edited += len(edited)
+        self.stats.forgotten += len(gone)
+
+    def _skip(self, message_ids: list[int]) -> None:
+        """Excludes posts from later batches, and counts them as failed."""
+        self._skipped.update(message_ids)
+        self.stats.failed += len(message_ids)
+
+    @command(name="reconciler")
+    @commands.is_owner()
+    async def show_stats(self, ctx: Context):
+        """Shows the progress of the outdated post reconciler."""
+        description = f"Runs every {RECONCILE_INTERVAL}s, editing at most {RECONCILE_BUDGET_PER_TICK} posts per run."
+        em = utils.info_embed("Reconciler", description)
+        for name, value in self.stats.as_fields().items():
+            em.add_field(name=name, value=value, inline=True)
+        await ctx.send(embed=em)
+
+
+async def setup(bot: RedstoneSquid):
+    """Called by discord.py when the cog is added to the bot via bot.load_extension."""
+    await bot.add_cog(ReconcilerCog(bot))
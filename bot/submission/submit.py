@@ -1,9 +1,11 @@
 """A cog with commands to submit, view, confirm and deny submissions."""
 # from __future__ import annotations  # dpy cannot resolve FlagsConverter with forward references :(
 
+import asyncio
 from collections.abc import Sequence
 from typing import Literal, cast, TYPE_CHECKING, Any
 
+import aiohttp
 import discord
 from discord import InteractionResponse, Guild
 from discord.ext import commands
@@ -15,26 +17,29 @@ from discord.ext.commands import (
     hybrid_command,
     flag,
 )
-from postgrest import APIResponse
 
 from bot import utils, config
+from bot.fanout import send_to_channels, edit_messages
 from bot.submission.ui import BuildSubmissionForm, ConfirmationView
 from database import message as msg
-from database.builds import get_all_builds, Build
-from database.database import DatabaseManager
+from database.builds import count_builds, iter_builds, Build
 from database.enums import Status, Category
-from bot._types import SubmissionCommandResponse, GuildMessageable
+from bot._types import SubmissionCommandResponse
 from bot.utils import RunningMessage, parse_dimensions
 from database.message import get_build_id_by_message
-from database.schema import TypeRecord
-from database.server_settings import get_server_setting
-from database.utils import upload_to_catbox
+from database.query_budget import budgeted
+from database.reference_data import fetch_types
+from database.server_settings import is_vote_channel
+from database.utils import stream_url, upload_to_catbox
 
 if TYPE_CHECKING:
     from bot.main import RedstoneSquid
+    from bot.submission.backfill import BackfillCog
 
 submission_roles = ["Admin", "Moderator", "Redstoner"]
 # TODO: Set up a webhook for the bot to handle google form submissions.
+PENDING_LIST_SIZE = 20
+"""The maximum number of submissions listed by /submissions pending, so that the list fits in an embed."""
 
 
 class SubmissionsCog(Cog, name="Submissions"):
@@ -50,20 +55,20 @@ class SubmissionsCog(Cog, name="Submissions"):
     async def get_pending_submissions(self, ctx: Context):
         """Shows an overview of all submissions pending review."""
         async with utils.RunningMessage(ctx) as sent_message:
-            pending_submissions = await get_all_builds(Status.PENDING)
-
-            if len(pending_submissions) == 0:
-                desc = "No open submissions."
-            else:
-                desc = []
-                for sub in pending_submissions:
-                    # ID - Title
-                    # by Creators - submitted by Submitter
-                    desc.append(
-                        # FIXME: sub.creators_ign is assumed to be a list, but it's a string
-                        f"**{sub.id}** - {sub.get_title()}\n_by {', '.join(sorted(sub.creators_ign))}_ - _submitted by {sub.submitter_id}_"  # type: ignore
-                    )
-                desc = "\n\n".join(desc)
+            total = await count_builds(Status.PENDING)
+            desc = []
+            async for sub in iter_builds(Status.PENDING, page_size=PENDING_LIST_SIZE, profile="title"):
+                # ID - Title
+                # by Creators - submitted by Submitter
+                desc.append(
+                    # FIXME: sub.creators_ign is assumed to be a list, but it's a string
+                    f"**{sub.id}** - {sub.get_title()}\n_by {', '.join(sorted(sub.creators_ign))}_ - _submitted by {sub.submitter_id}_"  # type: ignore
+                )
+                if len(desc) == PENDING_LIST_SIZE:
+                    break
+            if total > len(desc):
+                desc.append(f"...and {total - len(desc)} more.")
+            desc = "\n\n".join(desc) if desc else "No open submissions."
 
             em = utils.info_embed(title="Open Records", description=desc)
             await sent_message.edit(embed=em)
@@ -72,7 +77,7 @@ class SubmissionsCog(Cog, name="Submissions"):
     async def view_function(self, ctx: Context, submission_id: int):
         """Displays a submission."""
         async with utils.RunningMessage(ctx) as sent_message:
-            submission = await Build.from_id(submission_id)
+            submission = await Build.from_id(submission_id, profile="embed")
 
             if submission is None:
                 error_embed = utils.error_embed("Error", "No open submission with that ID.")
@@ -96,7 +101,7 @@ class SubmissionsCog(Cog, name="Submissions"):
 
         This posts the submission to all the servers which configured the bot."""
         async with utils.RunningMessage(ctx) as sent_message:
-            build = await Build.from_id(submission_id)
+            build = await Build.from_id(submission_id, profile="embed")
 
             if build is None:
                 error_embed = utils.error_embed("Error", "No pending submission with that ID.")
@@ -114,7 +119,7 @@ class SubmissionsCog(Cog, name="Submissions"):
     async def deny_function(self, ctx: Context, submission_id: int):
         """Marks a submission as denied."""
         async with utils.RunningMessage(ctx) as sent_message:
-            build = await Build.from_id(submission_id)
+            build = await Build.from_id(submission_id, profile="title")
 
             if build is None:
                 error_embed = utils.error_embed("Error", "No pending submission with that ID.")
@@ -125,20 +130,14 @@ class SubmissionsCog(Cog, name="Submissions"):
             success_embed = utils.info_embed("Success", "Submission has been denied.")
             return await sent_message.edit(embed=success_embed)
 
-    # @submission_hybrid_group.command("send_all")
-    # @has_any_role(*submission_roles)
+    @submission_hybrid_group.command("send_all")
+    @has_any_role(*submission_roles)
     async def send_all(self, ctx: Context):
         """Sends all records and builds to this server, in the channels set."""
-        # NOT in use right now
-        async with utils.RunningMessage(ctx) as sent_message:
-            assert ctx.guild is not None
-            unsent_builds = await msg.get_unsent_builds(ctx.guild.id)
-
-            for build in unsent_builds:
-                await self.post_build(build, guilds=[ctx.guild])
-
-            success_embed = utils.info_embed("Success", "All posts have been sent.")
-            return await sent_message.edit(embed=success_embed)
+        assert ctx.guild is not None
+        backfill = cast("BackfillCog", self.bot.get_cog("Backfill"))
+        total = await backfill.start(ctx.guild)
+        await ctx.send(embed=utils.info_embed("Sending", f"Sending {total} posts in the background."))
 
     @hybrid_command(name="versions")
     async def versions(self, ctx: Context):
@@ -202,12 +201,15 @@ class SubmissionsCog(Cog, name="Submissions"):
             await message.edit(embed=success_embed)
             await self.post_build(build)
 
-    async def post_build(self, build: Build, *, guilds: Sequence[Guild] | None = None) -> None:
+    async def post_build(self, build: Build, *, guilds: Sequence[Guild] | None = None) -> list[discord.Message]:
         """Posts a submission to the appropriate discord channels.
 
         Args:
             build (Build): The build to post.
             guilds (list[Guild], optional): The guilds to post to. If None, posts to all guilds. Defaults to None.
+
+        Returns:
+            The messages that were sent. Channels that failed to receive the message are skipped.
         """
         # TODO: There are no checks to see if the submission has already been posted, or if the submission is actually a record
         if build.id is None:
@@ -219,11 +221,10 @@ class SubmissionsCog(Cog, name="Submissions"):
         channel_ids = await build.get_channel_ids_to_post_to([guild.id for guild in guilds])
         em = build.generate_embed()
 
-        for channel_id in channel_ids:
-            channel = self.bot.get_channel(channel_id)
-            assert isinstance(channel, GuildMessageable)
-            message = await channel.send(embed=em)
-            await msg.add_message(channel.guild.id, build.id, message.channel.id, message.id, "build_post")
+        messages = await send_to_channels(self.bot, channel_ids, embed=em)
+        posted = [(message.guild.id, message.channel.id, message.id) for message in messages if message.guild]
+        await msg.add_messages(build.id, posted, "build_post")
+        return messages
 
     class SubmitFormFlags(commands.FlagConverter):
         """Parameters information for the /submit command."""
@@ -239,6 +240,7 @@ class SubmissionsCog(Cog, name="Submissions"):
         await ctx.defer()
 
         build = Build()
+        attachments: list[discord.Attachment] = []
         for name, attachment in flags:
             if attachment is None:
                 continue
@@ -246,8 +248,23 @@ class SubmissionsCog(Cog, name="Submissions"):
             assert isinstance(attachment, discord.Attachment)
             if not attachment.content_type.startswith("image") and not attachment.content_type.startswith("video"):
                 raise ValueError(f"Unsupported content type: {attachment.content_type}")
+            attachments.append(attachment)
+
+        # Stream every attachment from Discord to catbox at the same time, without reading any of them into memory
+        async with aiohttp.ClientSession() as session:
+            urls = await asyncio.gather(
+                *(
+                    upload_to_catbox(
+                        attachment.filename,
+                        stream_url(session, attachment.url),
+                        attachment.content_type,
+                        session=session,
+                    )
+                    for attachment in attachments
+                )
+            )
 
-            url = upload_to_catbox(attachment.filename, await attachment.read(), attachment.content_type)
+        for attachment, url in zip(attachments, urls):
             if attachment.content_type.startswith("image"):  # pyright: ignore [reportOptionalMemberAccess]
                 build.image_urls.append(url)
             elif attachment.content_type.startswith("video"):  # pyright: ignore [reportOptionalMemberAccess]
@@ -341,13 +358,8 @@ class SubmissionsCog(Cog, name="Submissions"):
             raise ValueError("The message_id does not correspond to the build_id.")
 
         em = build.generate_embed()
-        channel = self.bot.get_channel(channel_id)
-        if not isinstance(channel, discord.PartialMessageable):
-            raise ValueError(f"Invalid channel type for a post channel: {type(channel)}")
-
-        message = await channel.fetch_message(message_id)
-        await message.edit(embed=em)
-        await msg.update_message_edited_time(message.id)
+        await self.bot.get_partial_messageable(channel_id).get_partial_message(message_id).edit(embed=em)
+        await msg.update_message_edited_time(message_id)
 
     async def update_build_messages(self, build: Build) -> None:
         """Updates all messages which are posts for a build."""
@@ -358,52 +370,43 @@ class SubmissionsCog(Cog, name="Submissions"):
         messages = await msg.get_build_messages(build.id)
         em = build.generate_embed()
 
-        for message in messages:
-            channel = self.bot.get_channel(message["channel_id"])
-            if not isinstance(channel, discord.PartialMessageable):
-                raise ValueError(f"Invalid channel type for a post channel: {type(channel)}")
-
-            message = await channel.fetch_message(message["message_id"])
-            await message.edit(embed=em)
-            await msg.update_message_edited_time(message.id)
+        edited_ids = await edit_messages(
+            self.bot, [(message["channel_id"], message["message_id"]) for message in messages], embed=em
+        )
+        await msg.update_messages_edited_time(edited_ids)
 
     @commands.hybrid_command()
     async def list_patterns(self, ctx: Context):
         """Lists all the available patterns."""
         async with RunningMessage(ctx) as sent_message:
-            patterns: APIResponse[TypeRecord] = await DatabaseManager().table("types").select("*").execute()
-            names = [pattern["name"] for pattern in patterns.data]
+            names = [pattern["name"] for pattern in (await fetch_types()).records]
             await sent_message.edit(content="Here are the available patterns:", embed=utils.info_embed("Patterns", ", ".join(names)))
 
     @Cog.listener(name="on_raw_reaction_add")
+    @budgeted()
     async def confirm_record(self, payload: discord.RawReactionActionEvent):
         """Listens for reactions on the vote channel and confirms the submission if the reaction is a thumbs up."""
         # --- A bunch of checks to make sure the reaction is valid ---
+        # These are all in-memory lookups, because this listener runs for every reaction the bot can see.
         # Must be in a guild
         if (guild_id := payload.guild_id) is None:
             return
 
         # Must be in the vote channel
-        vote_channel_id = await get_server_setting(guild_id, "Vote")
-        if vote_channel_id is None or payload.channel_id != vote_channel_id:
+        if not is_vote_channel(payload.channel_id):
             return
 
         # Must be users that are allowed to vote
         if payload.user_id != config.OWNER_ID:
             return
 
-        # The message must be from the bot
-        message: discord.Message = await self.bot.get_channel(payload.channel_id).fetch_message(payload.message_id)  # type: ignore[attr-defined]
-        if message.author.id != self.bot.user.id:  # type: ignore[attr-defined]
-            return
-
-        # A build ID must be associated with the message
-        build_id = await msg.get_build_id_by_message(payload.message_id)
+        # Must be a vote post, which means it is from the bot and a build ID is associated with it
+        build_id = msg.get_vote_post_build_id(payload.message_id)
         if build_id is None:
             return
 
         # The submission status must be pending
-        submission = await Build.from_id(build_id)
+        submission = await Build.from_id(build_id, profile="embed")
         assert submission is not None
         if submission.submission_status != Status.PENDING:
             return
@@ -415,14 +418,9 @@ class SubmissionsCog(Cog, name="Submissions"):
             await submission.confirm()
             message_ids = await msg.delete_message(guild_id, build_id)
             await self.post_build(submission)
+            vote_channel = self.bot.get_partial_messageable(payload.channel_id)
             for message_id in message_ids:
-                vote_channel = self.bot.get_channel(vote_channel_id)
-                if isinstance(vote_channel, GuildMessageable):
-                    message = await vote_channel.fetch_message(message_id)
-                    await message.delete()
-                else:
-                    # TODO: Add a check when adding vote channels to the database
-                    raise ValueError(f"Invalid channel type for a vote channel: {type(vote_channel)}")
+                await vote_channel.get_partial_message(message_id).delete()
 
 
 def format_submission_input(ctx: Context, data: SubmissionCommandResponse) -> dict[str, Any]:
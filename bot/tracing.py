@@ -0,0 +1,220 @@
+"""Traces of where the time of each command goes: database requests, Discord requests or local work.
+
+A `Trace` is bound to the current context by `start_trace` (called from the bot's invoke hooks for every command) or
+`trace` (for anything else, e.g. `RunningMessage` outside a command). Database time is added by
+`database.metrics.InstrumentedTransport`, Discord time by the aiohttp trace config from `discord_trace_config`, and
+named sections of local work (like `generate_embed`) by `span`. Whatever is left of the wall time is local work: CPU,
+waiting for rate limits and waiting for the event loop.
+
+Finished traces are kept in `recent_traces`, a ring buffer of the last `TRACE_BUFFER_SIZE` traces, which the owner
+command `traces` summarises.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+
+TRACE_BUFFER_SIZE = 200
+"""How many finished traces are kept."""
+
+
+class Trace:
+    """The time breakdown of one command (or other unit of work).
+
+    Requests that run concurrently (e.g. in `fan_out`) are all counted in full, so `db_seconds + discord_seconds` can
+    be more than the wall time.
+    """
+
+    __slots__ = ("name", "started_at", "wall_seconds", "db_seconds", "db_calls", "discord_seconds", "discord_calls",
+                 "spans", "error", "_start")  # fmt: skip
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.wall_seconds = 0.0
+        self.db_seconds = 0.0
+        self.db_calls = 0
+        self.discord_seconds = 0.0
+        self.discord_calls = 0
+        self.spans: dict[str, float] = {}
+        """The time (in seconds) spent in each named section of local work."""
+        self.error: str | None = None
+
+    @property
+    def other_seconds(self) -> float:
+        """The time not spent waiting for the database or Discord."""
+        return max(0.0, self.wall_seconds - self.db_seconds - self.discord_seconds)
+
+    def finish(self, error: str | None = None) -> None:
+        self.wall_seconds = time.perf_counter() - self._start
+        if error is not None and self.error is None:
+            self.error = error
+
+
+recent_traces: deque[Trace] = deque(maxlen=TRACE_BUFFER_SIZE)
+"""The most recently finished traces, oldest first."""
+
+_current_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    """The trace bound to the current context, if any."""
+    return _current_trace.get()
+
+
+def record_db_time(seconds: float) -> None:
+    """Adds a database request to the current trace, if there is one."""
+    current = _current_trace.get()
+    if current is not None:
+        current.db_seconds += seconds
+        current.db_calls += 1
+
+
+def record_discord_time(seconds: float) -> None:
+    """Adds a Discord request to the current trace, if there is one."""
+    current = _current_trace.get()
+    if current is not None:
+        current.discord_seconds += seconds
+        current.discord_calls += 1
+
+
+def start_trace(name: str) -> Trace:
+    """Binds a new trace to the current context. Use `finish_trace` to end it.
+
+    This is for hooks that cannot wrap the work in `trace`, like discord.py's before and after invoke hooks.
+    """
+    new_trace = Trace(name)
+    _current_trace.set(new_trace)
+    return new_trace
+
+
+def finish_trace(error: str | None = None) -> Trace | None:
+    """Ends the trace of the current context and adds it to `recent_traces`.
+
+    Args:
+        error: The name of the error the traced work failed with, if any.
+
+    Returns:
+        The trace that was bound to the current context, or None if there was none.
+    """
+    current = _current_trace.get()
+    _current_trace.set(None)
+    if current is not None:
+        current.finish(error)
+        recent_traces.append(current)
+    return current
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """Traces the block, unless it already runs inside a trace, in which case its time is part of that trace."""
+    current = _current_trace.get()
+    if current is not None:
+        yield current
+        return
+
+    new_trace = Trace(name)
+    token = _current_trace.set(new_trace)
+    try:
+        yield new_trace
+    except BaseException as e:
+        new_trace.finish(type(e).__name__)
+        raise
+    else:
+        new_trace.finish()
+    finally:
+        _current_trace.reset(token)
+        recent_traces.append(new_trace)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Records the time spent in a named section of local work. Can also be used as a decorator on sync functions."""
+    current = _current_trace.get()
+    if current is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.spans[name] = current.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def discord_trace_config() -> aiohttp.TraceConfig:
+    """Creates the aiohttp trace config that adds every Discord request (REST and webhooks) to the current trace.
+
+    Pass it to the bot as `http_trace`. Time spent sleeping on rate limits is not part of any request.
+    """
+
+    async def on_request_start(session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any) -> None:
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any) -> None:
+        record_discord_time(time.perf_counter() - ctx.start)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_end)
+    return trace_config
+
+
+def _bar(fractions: Iterable[tuple[str, float]], width: int = 30) -> str:
+    """Draws fractions of a whole as a single bar, one character per category."""
+    bar = "".join(char * round(fraction * width) for char, fraction in fractions)
+    return bar[:width].ljust(width, " ")
+
+
+def format_trace(t: Trace) -> str:
+    """Formats a trace as one line, with a bar of where its time went (D: database, R: Discord, .: local work)."""
+    wall = t.wall_seconds or 1e-9
+    bar = _bar([("D", t.db_seconds / wall), ("R", t.discord_seconds / wall), (".", t.other_seconds / wall)])
+    line = (
+        f"{t.name[:20]:<20} {t.wall_seconds * 1000:>6.0f}ms |{bar}| "
+        f"db {t.db_seconds * 1000:.0f}ms/{t.db_calls:.3g} "
+        f"discord {t.discord_seconds * 1000:.0f}ms/{t.discord_calls:.3g}"
+    )
+    if t.spans:
+        line += " " + " ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in t.spans.items())
+    if t.error is not None:
+        line += f" !{t.error}"
+    return line
+
+
+def summarize_traces(traces: Iterable[Trace]) -> list[str]:
+    """Summarises traces by name, like a flame graph flattened to one level: where the time of each command goes."""
+    totals: dict[str, Trace] = {}
+    counts: dict[str, int] = {}
+    for t in traces:
+        total = totals.get(t.name)
+        if total is None:
+            total = totals[t.name] = Trace(t.name)
+            counts[t.name] = 0
+        counts[t.name] += 1
+        total.wall_seconds += t.wall_seconds
+        total.db_seconds += t.db_seconds
+        total.db_calls += t.db_calls
+        total.discord_seconds += t.discord_seconds
+        total.discord_calls += t.discord_calls
+        for name, seconds in t.spans.items():
+            total.spans[name] = total.spans.get(name, 0.0) + seconds
+
+    lines = []
+    for name, total in sorted(totals.items(), key=lambda item: item[1].wall_seconds, reverse=True):
+        count = counts[name]
+        for attr in ("wall_seconds", "db_seconds", "db_calls", "discord_seconds", "discord_calls"):
+            setattr(total, attr, getattr(total, attr) / count)
+        total.spans = {span_name: seconds / count for span_name, seconds in total.spans.items()}
+        lines.append(f"{format_trace(total)} (avg of {count})")
+    return lines
@@ -8,7 +8,8 @@ from discord import Message, Webhook
 from discord.abc import Messageable
 
 from bot.config import OWNER_ID, PRINT_TRACEBACKS
-from database.database import DatabaseManager
+from bot.tracing import Trace, trace
+from database.reference_data import fetch_restrictions
 from database.schema import RECORD_CATEGORIES, DOOR_ORIENTATION_NAMES
 
 discord_red = 0xF04747
@@ -115,7 +116,9 @@ def parse_hallway_dimensions(dim_str: str) -> tuple[int | None, int | None, int
 
 
 class RunningMessage:
-    """Context manager to show a working message while the bot is working."""
+    """Context manager to show a working message while the bot is working.
+
+    The work is traced (see `bot.tracing`), as part of the trace of the command if it runs in one."""
 
     def __init__(
         self,
@@ -130,22 +133,37 @@ class RunningMessage:
         self.description = description
         self.delete_on_exit = delete_on_exit
         self.sent_message: Message
+        self._trace = trace(title)
 
     async def __aenter__(self) -> Message:
-        sent_message = await self.ctx.send(embed=info_embed(self.title, self.description))
-        if sent_message is None:
-            raise ValueError(
-                "Failed to send message. (You are probably sending a message to a webhook, try looking into Webhook.send)"
-            )
+        self.trace: Trace = self._trace.__enter__()
+        try:
+            sent_message = await self.ctx.send(embed=info_embed(self.title, self.description))
+            if sent_message is None:
+                raise ValueError(
+                    "Failed to send message. (You are probably sending a message to a webhook, try looking into Webhook.send)"
+                )
+        except BaseException as e:
+            self._trace.__exit__(type(e), e, e.__traceback__)
+            raise
 
         self.sent_message = sent_message
         return sent_message
 
     async def __aexit__(
         self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
+    ) -> bool:
+        try:
+            return await self._exit(exc_type, exc_val, exc_tb)
+        finally:
+            self._trace.__exit__(exc_type, exc_val, exc_tb)
+
+    async def _exit(
+        self, exc_type: type[BaseException] | None, exc_val: BaseException | None, exc_tb: TracebackType | None
     ) -> bool:
         # Handle exceptions
         if exc_type is not None:
+            self.trace.error = exc_type.__name__
             description = f"{str(exc_val)}"
             if PRINT_TRACEBACKS:
                 description += f'\n\n```{"".join(format_tb(exc_tb))}```'
@@ -185,7 +203,10 @@ async def parse_build_title(title: str) -> dict[str, Any]:
     else:
         data["category"] = "Door"
 
-    db = DatabaseManager()
     # Parse component restrictions
-    component_restrictions = await db.table("restrictions").select("name").eq("build_category", data["category"]).eq("type", "component").execute()
+    component_restrictions = [
+        restriction["name"]
+        for restriction in (await fetch_restrictions()).records
+        if restriction["build_category"] == data["category"] and restriction["type"] == "component"
+    ]
 
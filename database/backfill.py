@@ -0,0 +1,71 @@
+"""Some functions related to the backfill_jobs table, which checkpoints the posting of all unsent builds to a server."""
+
+from __future__ import annotations
+
+from postgrest.base_request_builder import APIResponse
+
+from database.database import DatabaseManager
+from database.schema import BackfillJobRecord, BackfillStatus
+from database.utils import utcnow
+
+
+async def start_backfill_job(server_id: int, total: int) -> BackfillJobRecord:
+    """Starts a backfill job for a server, replacing any previous job of that server."""
+    now = utcnow()
+    response: APIResponse[BackfillJobRecord] = (
+        await DatabaseManager()
+        .table("backfill_jobs")
+        .upsert(
+            {
+                "server_id": server_id,
+                "status": "running",
+                "last_build_id": None,
+                "posted": 0,
+                "total": total,
+                "error": None,
+                "started_at": now,
+                "updated_at": now,
+            }
+        )
+        .execute()
+    )
+    return response.data[0]
+
+
+async def get_backfill_job(server_id: int) -> BackfillJobRecord | None:
+    """Gets the backfill job of a server, or None if the server never had one."""
+    response: APIResponse[BackfillJobRecord] = (
+        await DatabaseManager().table("backfill_jobs").select("*").eq("server_id", server_id).execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def get_backfill_jobs(status: BackfillStatus | None = None) -> list[BackfillJobRecord]:
+    """Gets all backfill jobs, optionally filtered by status."""
+    query = DatabaseManager().table("backfill_jobs").select("*")
+    if status is not None:
+        query = query.eq("status", status)
+    response: APIResponse[BackfillJobRecord] = await query.order("server_id").execute()
+    return response.data
+
+
+async def checkpoint_backfill_job(server_id: int, last_build_id: int, posted: int) -> None:
+    """Records that all builds up to `last_build_id` have been posted to the server."""
+    await (
+        DatabaseManager()
+        .table("backfill_jobs")
+        .update({"last_build_id": last_build_id, "posted": posted, "updated_at": utcnow()})
+        .eq("server_id", server_id)
+        .execute()
+    )
+
+
+async def set_backfill_job_status(server_id: int, status: BackfillStatus, error: str | None = None) -> None:
+    """Changes the status of the backfill job of a server."""
+    await (
+        DatabaseManager()
+        .table("backfill_jobs")
+        .update({"status": status, "error": error, "updated_at": utcnow()})
+        .eq("server_id", server_id)
+        .execute()
+    )
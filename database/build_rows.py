@@ -0,0 +1,117 @@
+"""Typed rows for the build queries, decoded straight from the PostgREST response body.
+
+The supabase client parses every response into generic dicts (and validates them with pydantic) before the rows reach
+`Build.from_json`. For the queries that return many builds, the raw response bytes are decoded with msgspec into the
+structs below instead, which skips the intermediate dicts entirely. Columns that are not declared here are ignored.
+"""
+
+from __future__ import annotations
+
+from json import JSONDecodeError
+from typing import Any
+
+import msgspec
+from postgrest import AsyncQueryRequestBuilder, APIError
+from postgrest.exceptions import generate_default_error_message
+
+from database.enums import Status, Category
+
+
+class DoorRow(msgspec.Struct):
+    """A row of the doors table, see `DoorRecord`."""
+
+    orientation: str
+    """Not decoded as `DoorOrientationName`, so that one row with a legacy orientation does not fail the whole page."""
+    door_width: int | None = None
+    door_height: int | None = None
+    door_depth: int | None = None
+    normal_opening_time: int | None = None
+    normal_closing_time: int | None = None
+    visible_opening_time: int | None = None
+    visible_closing_time: int | None = None
+
+
+class TypeRow(msgspec.Struct):
+    """A row of the types table, see `TypeRecord`."""
+
+    name: str
+
+
+class RestrictionRow(msgspec.Struct):
+    """A row of the restrictions table, see `RestrictionRecord`."""
+
+    name: str
+    type: str
+
+
+class UserRow(msgspec.Struct):
+    """A row of the users table."""
+
+    id: int
+    ign: str | None = None
+
+
+class VersionRow(msgspec.Struct):
+    """A row of the versions table, see `VersionsRecord`."""
+
+    full_name_temp: str
+
+
+class BuildLinkRow(msgspec.Struct):
+    """A row of the build_links table."""
+
+    url: str
+    media_type: str
+
+
+class BuildRow(msgspec.Struct):
+    """A row of the builds table with its embedded relations, see `BuildRecord` and `BUILD_COLUMN_PROFILES`."""
+
+    id: int
+    submission_status: Status
+    category: Category
+    information: dict[str, Any]
+    edited_time: str
+    record_category: str | None = None
+    """Not decoded as `RecordCategory`, the database allows combined categories like 'Smallest Fastest'."""
+    width: int | None = None
+    height: int | None = None
+    depth: int | None = None
+    completion_time: str | None = None
+    server_info: dict[str, Any] | None = None
+    submitter_id: int | None = None
+    doors: DoorRow | None = None
+    types: list[TypeRow] = []
+    restrictions: list[RestrictionRow] = []
+    users: list[UserRow] = []
+    versions: list[VersionRow] | None = None
+    """None if the versions were not selected."""
+    build_links: list[BuildLinkRow] = []
+
+
+_build_rows_decoder = msgspec.json.Decoder(list[BuildRow])
+
+
+def decode_build_rows(raw: bytes) -> list[BuildRow]:
+    """Decodes a JSON array of builds, as returned by PostgREST, into `BuildRow` structs."""
+    return _build_rows_decoder.decode(raw)
+
+
+async def fetch_build_rows(query: AsyncQueryRequestBuilder[Any]) -> list[BuildRow]:
+    """Executes a select query on the builds table and decodes the response body into `BuildRow` structs.
+
+    Args:
+        query: The query to execute. It must return a list of rows, e.g. it must not use `single()`.
+
+    Raises:
+        APIError: If PostgREST returned an error.
+    """
+    response = await query.session.request(
+        query.http_method, query.path, json=query.json, params=query.params, headers=query.headers
+    )
+    if not response.is_success:
+        try:
+            raise APIError(response.json())
+        except JSONDecodeError:
+            raise APIError(generate_default_error_message(response))
+    return decode_build_rows(response.content)
@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import asyncio
-from functools import cache
-from collections.abc import Sequence, Mapping
-from typing import Literal, Any
+import copy
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Sequence, Mapping
+from typing import Literal, Any, NamedTuple, TypeAlias
 
 import discord
 from postgrest.base_request_builder import APIResponse
@@ -14,32 +15,109 @@ from postgrest.types import CountMethod
 import bot.config
 from database.schema import (
     BuildRecord,
-    DoorRecord,
-    TypeRecord,
     RestrictionRecord,
     Info,
-    VersionsRecord,
-    UnknownRestrictions,
     RecordCategory,
     DoorOrientationName,
     ChannelPurpose,
 )
+from database.build_rows import BuildRow, fetch_build_rows
 from database.database import DatabaseManager
-from database.server_settings import get_server_setting
-from database.user import add_user
+from database.reference_data import fetch_restrictions
+from database.server_settings import get_server_setting_for_servers
+from database.user import get_or_create_user_ids, remember_users
 from database.utils import utcnow
 from database.enums import Status, Category
 from bot import utils
 from bot.config import VERSIONS_LIST
+from bot.tracing import span
 
 
 all_build_columns = "*, versions(*), build_links(*), build_creators(*), users(*), types(*), restrictions(*), doors(*), extenders(*), utilities(*), entrances(*)"
 """All columns that needs to be joined in the build table to get all the information about a build."""
 
+BuildColumnProfile = Literal["title", "embed", "full"]
+BUILD_COLUMN_PROFILES: dict[BuildColumnProfile, str] = {
+    # Enough for Build.get_title() and the creators
+    "title": "*, users(*), types(*), restrictions(*), doors(*)",
+    # Enough for Build.generate_embed()
+    "embed": "*, versions(*), build_links(*), users(*), types(*), restrictions(*), doors(*)",
+    "full": all_build_columns,
+}
+"""The columns selected for each projection profile. Each profile contains everything in the profiles before it."""
+_PROFILE_ORDER: list[BuildColumnProfile] = ["title", "embed", "full"]
+
+BUILD_PAGE_SIZE = 50
+"""The default number of builds fetched per request by `iter_builds`."""
+
+BUILD_ID_CHUNK_SIZE = 100
+"""The maximum number of build ids put into a single `in_` filter by `get_builds`, to keep the request URL short."""
+
+MAX_CONCURRENT_BUILD_QUERIES = 4
+"""The maximum number of chunks `get_builds` fetches at the same time."""
+
+BUILD_CACHE_SIZE = 256
+"""The maximum number of decoded builds kept in memory by `build_cache`."""
+EMBED_CACHE_SIZE = 512
+"""The maximum number of rendered embeds kept in memory by `embed_cache`."""
+
+
+class JsonField(NamedTuple):
+    """An attribute of `Build` that is stored under a key of a JSON column of the builds table."""
+
+    name: str
+    column: str
+    key: str
+
+
+BUILD_FIELD_NAMES: tuple[str, ...] = (
+    "id",
+    "submission_status",
+    "category",
+    "record_category",
+    "functional_versions",
+    "width",
+    "height",
+    "depth",
+    "door_width",
+    "door_height",
+    "door_depth",
+    "door_type",
+    "door_orientation_type",
+    "wiring_placement_restrictions",
+    "component_restrictions",
+    "miscellaneous_restrictions",
+    "normal_closing_time",
+    "normal_opening_time",
+    "visible_closing_time",
+    "visible_opening_time",
+    "information",
+    "creators_ign",
+    "image_urls",
+    "video_urls",
+    "world_download_urls",
+    "server_ip",
+    "coordinates",
+    "command",
+    "submitter_id",
+    "completion_time",
+    "edited_time",
+)
+"""The data attributes of `Build`, in the order they are iterated over."""
+_BUILD_FIELD_NAME_SET = frozenset(BUILD_FIELD_NAMES)
+_JSON_FIELDS = (
+    JsonField("server_ip", "server_info", "server_ip"),
+    JsonField("coordinates", "server_info", "coordinates"),
+    JsonField("command", "server_info", "command_to_build"),
+)
+"""The attributes of `Build` that are packed into JSON columns when saving, and unpacked when loading."""
+
 
 class Build:
     """A class representing a submission to the database. This class is used to store and manipulate submissions."""
 
+    __slots__ = BUILD_FIELD_NAMES + ("loaded_profile",)
+
     def __init__(self):
         """Initializes an empty build.
 
@@ -78,7 +156,7 @@ class Build:
         self.video_urls: list[str] = []
         self.world_download_urls: list[str] = []
 
-        # TODO: Put these three into server_info
+        # Stored in the server_info JSON column
         self.server_ip: str | None = None
         self.coordinates: str | None = None
         self.command: str | None = None
@@ -88,10 +166,13 @@ class Build:
         self.completion_time: str | None = None
         self.edited_time: str | None = None
 
+        # The columns this build was loaded with, None if the build was not loaded from the database.
+        # Relations outside of the profile are left unset, load the build again with a larger profile to get them.
+        self.loaded_profile: BuildColumnProfile | None = None
+
     def __iter__(self):
         """Iterates over the *attributes* of the Build object."""
-        for attr in [a for a in dir(self) if not a.startswith("__") and not callable(getattr(self, a))]:
-            yield attr
+        return iter(BUILD_FIELD_NAMES)
 
     @property
     def dimensions(self) -> tuple[int | None, int | None, int | None]:
@@ -111,13 +192,10 @@ class Build:
     def door_dimensions(self, dimensions: tuple[int | None, int | None, int | None]) -> None:
         self.door_width, self.door_height, self.door_depth = dimensions
 
-    # TODO: Invalidate cache every, say, 1 day (or make supabase callback whenever the table is updated)
     @staticmethod
-    @cache
     async def fetch_all_restrictions() -> list[RestrictionRecord]:
         """Fetches all restrictions from the database."""
-        response: APIResponse[RestrictionRecord] = await DatabaseManager().table("restrictions").select("*").execute()
-        return response.data
+        return (await fetch_restrictions()).records
 
     def get_restrictions(
         self,
@@ -150,43 +228,48 @@ class Build:
             self.component_restrictions = []
             self.miscellaneous_restrictions = []
 
-            for restriction in await self.fetch_all_restrictions():
-                for door_restriction in restrictions:
-                    if door_restriction.lower() == restriction["name"].lower():
-                        if restriction["type"] == "wiring-placement":
-                            self.wiring_placement_restrictions.append(restriction["name"])
-                        elif restriction["type"] == "component":
-                            self.component_restrictions.append(restriction["name"])
-                        elif restriction["type"] == "miscellaneous":
-                            self.miscellaneous_restrictions.append(restriction["name"])
+            all_restrictions = await fetch_restrictions()
+            for door_restriction in restrictions:
+                restriction = all_restrictions.get_by_name(door_restriction, case_sensitive=False)
+                if restriction is None:
+                    continue
+                if restriction["type"] == "wiring-placement":
+                    self.wiring_placement_restrictions.append(restriction["name"])
+                elif restriction["type"] == "component":
+                    self.component_restrictions.append(restriction["name"])
+                elif restriction["type"] == "miscellaneous":
+                    self.miscellaneous_restrictions.append(restriction["name"])
 
     @staticmethod
-    async def from_id(build_id: int) -> Build | None:
+    async def from_id(build_id: int, *, profile: BuildColumnProfile = "full") -> Build | None:
         """Creates a new Build object from a database ID.
 
         Args:
             build_id: The ID of the build to retrieve.
+            profile: The columns to load, see `BUILD_COLUMN_PROFILES`.
 
         Returns:
             The Build object with the specified ID, or None if the build was not found.
         """
         build = Build()
         build.id = build_id
-        return await build.load()
+        return await build.load(profile=profile)
 
     @staticmethod
-    def from_json(data: dict[str, Any]) -> Build:
+    def from_json(data: dict[str, Any], profile: BuildColumnProfile = "full") -> Build:
         """
         Converts a JSON object to a Build object.
 
         Args:
             data: the exact JSON object returned by
-                `DatabaseManager().table('builds').select(all_build_columns).eq('id', build_id).execute().data[0]`
+                `DatabaseManager().table('builds').select(BUILD_COLUMN_PROFILES[profile]).eq('id', build_id).execute().data[0]`
+            profile: The profile the JSON object was selected with.
 
         Returns:
             A Build object.
         """
         build = Build()
+        build.loaded_profile = profile
         build.id = data["id"]
         build.submission_status = data["submission_status"]
         build.record_category = data["record_category"]
@@ -231,20 +314,21 @@ class Build:
 
         creators: list[dict[str, Any]] = data.get("users", [])
         build.creators_ign = [creator["ign"] for creator in creators]
+        remember_users(creators)
 
-        versions: list[dict[str, Any]] = data.get("versions", [])
-        build.functional_versions = [version["full_name_temp"] for version in versions]
+        if "versions" in data:
+            versions: list[dict[str, Any]] = data["versions"]
+            build.functional_versions = [version["full_name_temp"] for version in versions]
 
         links: list[dict[str, Any]] = data.get("build_links", [])
         build.image_urls = [link["url"] for link in links if link["media_type"] == "image"]
         build.video_urls = [link["url"] for link in links if link["media_type"] == "video"]
-        build.world_download_urls = [link["url"] for link in links if link["media_type"] == "world-download"]
+        build.world_download_urls = [link["url"] for link in links if link["media_type"] == "world_download"]
 
-        server_info: dict[str, Any] = data["server_info"]
-        if server_info:
-            build.server_ip = server_info.get("server_ip")
-            build.coordinates = server_info.get("coordinates")
-            build.command = server_info.get("command_to_build")
+        for field in _JSON_FIELDS:
+            json_column: dict[str, Any] | None = data[field.column]
+            if json_column:
+                setattr(build, field.name, json_column.get(field.key))
 
         build.submitter_id = data["submitter_id"]
         build.completion_time = data["completion_time"]
@@ -256,9 +340,80 @@ class Build:
     def from_dict(submission: dict) -> Build:
         """Creates a new Build object from a dictionary. No validation is done on the data."""
         build = Build()
-        for attr in build:
-            if attr in submission:
-                setattr(build, attr, submission[attr])
+        for attr in _BUILD_FIELD_NAME_SET.intersection(submission):
+            setattr(build, attr, submission[attr])
+
+        return build
+
+    @staticmethod
+    def from_row(row: BuildRow, profile: BuildColumnProfile = "full") -> Build:
+        """Converts a decoded row (see `fetch_build_rows`) to a Build object.
+
+        Unlike `from_json`, restrictions and links are partitioned by their type in a single pass.
+
+        Args:
+            row: The row to convert.
+            profile: The profile the row was selected with.
+
+        Returns:
+            A Build object.
+        """
+        build = Build()
+        build.loaded_profile = profile
+        build.id = row.id
+        build.submission_status = row.submission_status
+        # Passed through unvalidated, like in from_json
+        build.record_category = row.record_category  # type: ignore
+        build.category = row.category
+
+        build.width = row.width
+        build.height = row.height
+        build.depth = row.depth
+
+        # FIXME: This is hardcoded for now
+        build.door_type = [type_.name for type_ in row.types] or ["Regular"]
+
+        if (door := row.doors) is not None:
+            build.door_orientation_type = door.orientation  # type: ignore
+            build.door_width = door.door_width
+            build.door_height = door.door_height
+            build.door_depth = door.door_depth
+            build.normal_closing_time = door.normal_closing_time
+            build.normal_opening_time = door.normal_opening_time
+            build.visible_closing_time = door.visible_closing_time
+            build.visible_opening_time = door.visible_opening_time
+
+        restrictions: dict[str, list[str]] = {"wiring-placement": [], "component": [], "miscellaneous": []}
+        for restriction in row.restrictions:
+            if (names := restrictions.get(restriction.type)) is not None:
+                names.append(restriction.name)
+        build.wiring_placement_restrictions = restrictions["wiring-placement"]
+        build.component_restrictions = restrictions["component"]
+        build.miscellaneous_restrictions = restrictions["miscellaneous"]
+
+        build.information = row.information  # type: ignore
+
+        build.creators_ign = [creator.ign for creator in row.users if creator.ign is not None]
+        remember_users({"id": creator.id, "ign": creator.ign} for creator in row.users)
+
+        if row.versions is not None:
+            build.functional_versions = [version.full_name_temp for version in row.versions]
+
+        links: dict[str, list[str]] = {"image": [], "video": [], "world_download": []}
+        for link in row.build_links:
+            if (urls := links.get(link.media_type)) is not None:
+                urls.append(link.url)
+        build.image_urls = links["image"]
+        build.video_urls = links["video"]
+        build.world_download_urls = links["world_download"]
+
+        if row.server_info:
+            for field in _JSON_FIELDS:
+                setattr(build, field.name, row.server_info.get(field.key))
+
+        build.submitter_id = row.submitter_id
+        build.completion_time = row.completion_time
+        build.edited_time = row.edited_time
 
         return build
 
@@ -281,19 +436,21 @@ class Build:
         channel_purpose = self.get_channel_type_to_post_to()
         # TODO: Special handling for "Vote" channel type, it should only be posted to OWNER_SERVER
 
-        channels: list[int] = []
-        # For each server the bot can see
-        for guild_id in guild_ids:
-            channel_id = await get_server_setting(guild_id, channel_purpose)
-            if channel_id:
-                channels.append(channel_id)
+        return await get_server_setting_for_servers(guild_ids, channel_purpose)
 
-        return channels
+    def has_profile(self, profile: BuildColumnProfile) -> bool:
+        """Whether all the columns of `profile` are available on this build."""
+        if self.loaded_profile is None:
+            return True
+        return _PROFILE_ORDER.index(self.loaded_profile) >= _PROFILE_ORDER.index(profile)
 
-    async def load(self) -> Build:
+    async def load(self, *, profile: BuildColumnProfile = "full") -> Build:
         """
         Loads the build from the database. All previous data is overwritten.
 
+        Args:
+            profile: The columns to load, see `BUILD_COLUMN_PROFILES`.
+
         Returns:
             The Build object.
 
@@ -303,207 +460,66 @@ class Build:
         if self.id is None:
             raise ValueError("Build ID is missing.")
 
+        if (cached := build_cache.get(self.id)) is not None:
+            return cached
+
+        generation = build_cache.generation
         db = DatabaseManager()
-        response = await db.table("builds").select(all_build_columns).eq("id", self.id).maybe_single().execute()
-        if not response:
+        rows = await fetch_build_rows(db.table("builds").select(BUILD_COLUMN_PROFILES[profile]).eq("id", self.id))
+        if not rows:
             raise ValueError("Build not found in the database.")
-        return Build.from_json(response.data)
+        build = Build.from_row(rows[0], profile)
+        if profile == "full":
+            build_cache.put(build, generation)
+        return build
 
     async def save(self) -> None:
         """
         Updates the build in the database with the given data.
 
-        If the build does not exist in the database, it will be inserted instead.
+        If the build does not exist in the database, it will be inserted instead. The build and all of its related
+        tables are written by the `upsert_build` database function in a single transaction, so a failed save does not
+        leave a partially written build behind.
+
+        Raises:
+            ValueError: If the build was loaded without all of its columns.
         """
+        if not self.has_profile("full"):
+            raise ValueError("Cannot save a partially loaded build, load it with the full profile first.")
         self.edited_time = utcnow()
 
         data = {key: value for key, value in self.as_dict().items() if value is not None}
-        build_data = {key: data[key] for key in BuildRecord.__annotations__.keys() if key in data}
-        # information is a special JSON field in the database that stores various information about the build
-        # this needs to be kept because it will be updated later
-        information: Info = build_data.get("information", {})
-
-        db = DatabaseManager()
-        response: APIResponse[BuildRecord]
-        if self.id:
-            response = await db.table("builds").update(build_data, count=CountMethod.exact).eq("id", self.id).execute()
-            assert response.count == 1
-            delete_build_on_error = False
-        else:
-            response = await db.table("builds").insert(build_data, count=CountMethod.exact).execute()
-            assert response.count == 1
-            self.id = response.data[0]["id"]
-            delete_build_on_error = True
+        data.setdefault("functional_versions", [VERSIONS_LIST[-1]])
+        # Pack the attributes stored inside JSON columns (e.g. server_info) into those columns
+        for field in _JSON_FIELDS:
+            if field.name in data:
+                data.setdefault(field.column, {})[field.key] = data.pop(field.name)
+        if "creators_ign" in data:
+            data["creator_ids"] = await get_or_create_user_ids(data["creators_ign"])
 
         try:
-            await self._update_build_subcategory_table(data)
-
-            unknown_restrictions = await self._update_build_restrictions_table(data)
-            if unknown_restrictions:
-                information["unknown_restrictions"] = unknown_restrictions
-
-            unknown_types = await self._update_build_types_table(data)
-            if unknown_types:
-                information["unknown_patterns"] = unknown_types
-
-            # Update the information field in the database to store any unknown restrictions or types
-            await db.table("builds").update({"information": information}).eq("id", self.id).execute()
-
-            await self._update_build_links_table(data)
-            await self._update_build_creators_table(data)
-            await self._update_build_versions_table(data)
-        except:
-            if delete_build_on_error:
-                await db.table("builds").delete().eq("id", self.id).execute()
-            raise
-
-    async def _update_build_subcategory_table(self, data: dict[str, Any]) -> None:
-        """Updates the subcategory table with the given data."""
-        db = DatabaseManager()
-        if data["category"] == "Door":
-            doors_data = {key: data[key] for key in DoorRecord.__annotations__.keys() if key in data}
-            # FIXME: database and Build class have different names for the same field
-            doors_data["orientation"] = data["door_orientation_type"]
-            doors_data["build_id"] = self.id
-            await db.table("doors").upsert(doors_data).execute()
-        elif data["category"] == "Extender":
-            raise NotImplementedError
-        elif data["category"] == "Utility":
-            raise NotImplementedError
-        elif data["category"] == "Entrance":
-            raise NotImplementedError
-        else:
-            raise ValueError("Build category must be set")
-
-    async def _update_build_restrictions_table(self, data: dict[str, Any]) -> UnknownRestrictions:
-        """Updates the build_restrictions table with the given data"""
-        db = DatabaseManager()
-        build_restrictions = (
-            data.get("wiring_placement_restrictions", [])
-            + data.get("component_restrictions", [])
-            + data.get("miscellaneous_restrictions", [])
-        )
-        response: APIResponse[RestrictionRecord] = (
-            await db.table("restrictions").select("*").in_("name", build_restrictions).execute()
-        )
-        restriction_ids = [restriction["id"] for restriction in response.data]
-        build_restrictions_data = list(
-            {"build_id": self.id, "restriction_id": restriction_id} for restriction_id in restriction_ids
-        )
-        if build_restrictions_data:
-            await db.table("build_restrictions").upsert(build_restrictions_data).execute()
-
-        unknown_restrictions: UnknownRestrictions = {}
-        unknown_wiring_restrictions = []
-        unknown_component_restrictions = []
-        for wiring_restriction in data.get("wiring_placement_restrictions", []):
-            if wiring_restriction not in [
-                restriction["name"] for restriction in response.data if restriction["type"] == "wiring-placement"
-            ]:
-                unknown_wiring_restrictions.append(wiring_restriction)
-        for component_restriction in data.get("component_restrictions", []):
-            if component_restriction not in [
-                restriction["name"] for restriction in response.data if restriction["type"] == "component"
-            ]:
-                unknown_component_restrictions.append(component_restriction)
-        # TODO: miscellaneous restrictions?
-        if unknown_wiring_restrictions:
-            unknown_restrictions["wiring_placement_restrictions"] = unknown_wiring_restrictions
-        if unknown_component_restrictions:
-            unknown_restrictions["component_restrictions"] = unknown_component_restrictions
-        return unknown_restrictions
-
-    async def _update_build_types_table(self, data: dict[str, Any]) -> list[str]:
-        """Updates the build_types table with the given data.
-
-        Returns:
-            A list of unknown types.
-        """
-        db = DatabaseManager()
-        if data.get("door_type") is not None:
-            door_type = data.get("door_type")
-            if not isinstance(door_type, list):
-                raise ValueError("Door type must be a list")
-        else:
-            door_type = ["Regular"]
-        response: APIResponse[TypeRecord] = (
-            await db.table("types")
-            .select("*")
-            .eq("build_category", data.get("category"))
-            .in_("name", door_type)
-            .execute()
-        )
-        type_ids = [type_["id"] for type_ in response.data]
-        build_types_data = list({"build_id": self.id, "type_id": type_id} for type_id in type_ids)
-        await db.table("build_types").upsert(build_types_data).execute()
-        unknown_types = []
-        for door_type in data.get("door_type", []):
-            if door_type not in [type_["name"] for type_ in response.data]:
-                unknown_types.append(door_type)
-        return unknown_types
-
-    async def _update_build_links_table(self, data: dict[str, Any]) -> None:
-        """Updates the build_links table with the given data."""
-        build_links_data = []
-        if data.get("image_urls"):
-            build_links_data.extend(
-                {"build_id": self.id, "url": link, "media_type": "image"} for link in data.get("image_urls", [])
+            response: APIResponse[BuildRecord] = (
+                await DatabaseManager().rpc("upsert_build", {"build_data": data}).execute()
             )
-        if data.get("video_urls"):
-            build_links_data.extend(
-                {"build_id": self.id, "url": link, "media_type": "video"} for link in data.get("video_urls", [])
-            )
-        if data.get("world_download_urls"):
-            build_links_data.extend(
-                {"build_id": self.id, "url": link, "media_type": "world_download"}
-                for link in data.get("world_download_urls", [])
-            )
-        if build_links_data:
-            await DatabaseManager().table("build_links").upsert(build_links_data).execute()
-
-    async def _update_build_creators_table(self, data: dict[str, Any]) -> None:
-        """Updates the build_creators table with the given data."""
-        db = DatabaseManager()
-        creator_ids = []
-        for creator_ign in data.get("creators_ign", []):
-            response = await db.table("users").select("id").eq("ign", creator_ign).maybe_single().execute()
-            if response:
-                creator_ids.append(response.data["id"])
-            else:
-                creator_id = add_user(ign=creator_ign)
-                creator_ids.append(creator_id)
-
-        build_creators_data = [{"build_id": self.id, "user_id": user_id} for user_id in creator_ids]
-        if build_creators_data:
-            await DatabaseManager().table("build_creators").upsert(build_creators_data).execute()
-
-    async def _update_build_versions_table(self, data: dict[str, Any]) -> None:
-        """Updates the build_versions table with the given data."""
-        db = DatabaseManager()
-        # No error is raised if the version is not found in the database
-        response: APIResponse[VersionsRecord] = (
-            await db.table("versions")
-            .select("*")
-            .in_("full_name_temp", data.get("functional_versions", [VERSIONS_LIST[-1]]))
-            .execute()
-        )
-        version_ids = [version["id"] for version in response.data]
-        build_versions_data = list({"build_id": self.id, "version_id": version_id} for version_id in version_ids)
-        await db.table("build_versions").upsert(build_versions_data).execute()
+        finally:
+            invalidate_cached_build(self.id)
+        assert len(response.data) == 1
+        self.id = response.data[0]["id"]
+        # The database stores unknown restrictions and types in the information field
+        self.information = response.data[0]["information"]
 
     def update_local(self, data: dict[Any, Any]) -> None:
         """Updates the build locally with the given data. No validation is done on the data."""
         # FIXME: this does not work with nested data like self.information
         for key, value in data.items():
-            if hasattr(self, key):
+            if key in _BUILD_FIELD_NAME_SET:
                 setattr(self, key, value)
+        # The build no longer matches a saved revision, so it must not be served from (or put in) the embed cache
+        self.edited_time = None
 
     def as_dict(self) -> dict[str, Any]:
         """Converts the build to a dictionary."""
-        build = {}
-        for attr in self:
-            build[attr] = getattr(self, attr)
-        return build
+        return {attr: getattr(self, attr) for attr in BUILD_FIELD_NAMES}
 
     async def confirm(self) -> None:
         """Marks the build as confirmed.
@@ -513,12 +529,15 @@ class Build:
         """
         self.submission_status = Status.CONFIRMED
         db = DatabaseManager()
-        response: APIResponse[BuildRecord] = (
-            await db.table("builds")
-            .update({"submission_status": Status.CONFIRMED}, count=CountMethod.exact)
-            .eq("id", self.id)
-            .execute()
-        )
+        try:
+            response: APIResponse[BuildRecord] = (
+                await db.table("builds")
+                .update({"submission_status": Status.CONFIRMED}, count=CountMethod.exact)
+                .eq("id", self.id)
+                .execute()
+            )
+        finally:
+            invalidate_cached_build(self.id)
         if response.count != 1:
             raise ValueError("Failed to confirm submission in the database.")
 
@@ -530,17 +549,30 @@ class Build:
         """
         self.submission_status = Status.DENIED
         db = DatabaseManager()
-        response: APIResponse[BuildRecord] = (
-            await db.table("builds")
-            .update({"submission_status": Status.DENIED}, count=CountMethod.exact)
-            .eq("id", self.id)
-            .execute()
-        )
+        try:
+            response: APIResponse[BuildRecord] = (
+                await db.table("builds")
+                .update({"submission_status": Status.DENIED}, count=CountMethod.exact)
+                .eq("id", self.id)
+                .execute()
+            )
+        finally:
+            invalidate_cached_build(self.id)
         if response.count != 1:
             raise ValueError("Failed to deny submission in the database.")
 
+    @span("generate_embed")
     def generate_embed(self) -> discord.Embed:
-        """Generates an embed for the build."""
+        """Generates an embed for the build.
+
+        Embeds of saved builds are cached by revision, see `EmbedCache`."""
+        if not self.has_profile("embed"):
+            raise ValueError("The build was loaded without the columns needed for an embed.")
+
+        revision = self.get_embed_revision()
+        if revision is not None and (cached := embed_cache.get(revision)) is not None:
+            return cached
+
         em = utils.info_embed(title=self.get_title(), description=self.get_description())
 
         fields = self.get_metadata_fields()
@@ -551,8 +583,16 @@ class Build:
             em.set_image(url=self.image_urls[0])
 
         em.set_footer(text=f"Submission ID: {self.id}.")
+        if revision is not None:
+            embed_cache.put(revision, em)
         return em
 
+    def get_embed_revision(self) -> EmbedRevision | None:
+        """The key under which the embed of this build is cached, or None if the build is not a saved revision."""
+        if self.id is None or self.edited_time is None:
+            return None
+        return self.id, self.edited_time, self.submission_status, hash(tuple(bot.config.VERSIONS_LIST))
+
     def get_title(self) -> str:
         """Generates the official Redstone Squid defined title for the build."""
         title = ""
@@ -693,51 +733,256 @@ class Build:
         return fields
 
 
-async def get_all_builds(submission_status: Status | None = None) -> list[Build]:
+class BuildCache:
+    """An in-process LRU cache of decoded builds.
+
+    Entries are keyed by build id. A build read from the database before a write but put in the cache after the write
+    has invalidated it would be stale, so callers read `generation` before fetching and pass it to `put`, which drops
+    the build if anything was invalidated in the meantime. Builds are copied on the way in and out, so callers are
+    free to mutate what they get back.
+    """
+
+    def __init__(self, maxsize: int = BUILD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        """Incremented by every invalidation."""
+        self._builds: OrderedDict[int, Build] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._builds)
+
+    def get(self, build_id: int) -> Build | None:
+        """Gets a copy of a cached build, or None if it is not cached."""
+        build = self._builds.get(build_id)
+        if build is None:
+            self.misses += 1
+            return None
+        self._builds.move_to_end(build_id)
+        self.hits += 1
+        return copy.deepcopy(build)
+
+    def put(self, build: Build, generation: int | None = None) -> None:
+        """Caches a copy of a build, evicting the least recently used build if the cache is full.
+
+        Args:
+            build: The build to cache.
+            generation: The `generation` read before the build was fetched. If anything was invalidated since, the
+                build may predate a write and is not cached. None caches the build unconditionally.
+        """
+        if build.id is None or (generation is not None and generation != self.generation):
+            return
+        self._builds[build.id] = copy.deepcopy(build)
+        self._builds.move_to_end(build.id)
+        while len(self._builds) > self.maxsize:
+            self._builds.popitem(last=False)
+
+    def invalidate(self, build_id: int) -> None:
+        """Removes a build from the cache, if it is cached."""
+        self.generation += 1
+        self._builds.pop(build_id, None)
+
+    def clear(self) -> None:
+        """Removes all builds from the cache and resets the hit/miss counters."""
+        self.generation += 1
+        self._builds.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+build_cache = BuildCache()
+"""The cache used by `Build.load` and `get_builds`. Writes through `Build` invalidate the affected entry."""
+
+
+EmbedRevision: TypeAlias = tuple[int, str, int | None, int]
+"""A build id, its edited_time, its submission status and a fingerprint of `VERSIONS_LIST`, which together determine
+its embed. The status is part of the key because confirming or denying a build changes its title without changing its
+edited_time."""
+
+
+class EmbedCache:
+    """An in-process LRU cache of rendered build embeds.
+
+    Only the latest revision of each build is kept. An entry is only returned for the exact revision it was rendered
+    for, so editing, confirming or denying a build or changing `VERSIONS_LIST` makes the old entry unreachable even
+    without invalidation.
+    Embeds are stored as dicts and rebuilt on the way out, so callers are free to mutate what they get back.
+    """
+
+    def __init__(self, maxsize: int = EMBED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._embeds: OrderedDict[int, tuple[EmbedRevision, dict[str, Any]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._embeds)
+
+    def get(self, revision: EmbedRevision) -> discord.Embed | None:
+        """Gets a copy of the embed rendered for a build revision, or None if it is not cached."""
+        build_id = revision[0]
+        entry = self._embeds.get(build_id)
+        if entry is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self._embeds.move_to_end(build_id)
+        self.hits += 1
+        return discord.Embed.from_dict(copy.deepcopy(entry[1]))
+
+    def put(self, revision: EmbedRevision, embed: discord.Embed) -> None:
+        """Caches the embed rendered for a build revision, replacing any older revision of the same build."""
+        build_id = revision[0]
+        self._embeds[build_id] = (revision, copy.deepcopy(embed.to_dict()))
+        self._embeds.move_to_end(build_id)
+        while len(self._embeds) > self.maxsize:
+            self._embeds.popitem(last=False)
+
+    def invalidate(self, build_id: int) -> None:
+        """Removes the embed of a build from the cache, if it is cached."""
+        self._embeds.pop(build_id, None)
+
+    def clear(self) -> None:
+        """Removes all embeds from the cache and resets the hit/miss counters."""
+        self._embeds.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+embed_cache = EmbedCache()
+"""The cache used by `Build.generate_embed`. Writes through `Build` invalidate the affected entry."""
+
+
+def invalidate_cached_build(build_id: int | None) -> None:
+    """Drops a build from `build_cache` and `embed_cache`.
+
+    Writes call this after the request has finished, even if it failed (it may still have been applied). Invalidating
+    before the write would let a load that runs concurrently with the write put the old revision back in the cache.
+    """
+    if build_id is not None:
+        build_cache.invalidate(build_id)
+        embed_cache.invalidate(build_id)
+
+
+async def get_all_builds(
+    submission_status: Status | None = None, *, profile: BuildColumnProfile = "full"
+) -> list[Build]:
     """Fetches all builds from the database, optionally filtered by submission status.
 
     Args:
         submission_status: The status of the submissions to filter by. If None, all submissions are returned. See Build class for possible values.
+        profile: The columns to load, see `BUILD_COLUMN_PROFILES`.
 
     Returns:
         A list of Build objects.
     """
     db = DatabaseManager()
-    query = db.table("builds").select(all_build_columns)
+    query = db.table("builds").select(BUILD_COLUMN_PROFILES[profile])
 
-    if submission_status:
+    if submission_status is not None:
         query = query.eq("submission_status", submission_status.value)
 
-    response = await query.execute()
-    if not response:
-        return []
-    else:
-        return [Build.from_json(build_json) for build_json in response.data]
+    rows = await fetch_build_rows(query)
+    return [Build.from_row(row, profile) for row in rows]
+
+
+async def iter_builds(
+    submission_status: Status | None = None,
+    *,
+    page_size: int = BUILD_PAGE_SIZE,
+    profile: BuildColumnProfile = "full",
+) -> AsyncIterator[Build]:
+    """Iterates over the builds in the database in order of id, optionally filtered by submission status.
+
+    Builds are fetched `page_size` at a time, each page starting after the last id of the previous page, so only one
+    page is held in memory at a time.
+
+    Args:
+        submission_status: The status of the submissions to filter by. If None, all submissions are returned.
+        page_size: The number of builds to fetch per request.
+        profile: The columns to load, see `BUILD_COLUMN_PROFILES`.
+
+    Yields:
+        Build objects.
+    """
+    db = DatabaseManager()
+    last_id: int | None = None
+    while True:
+        query = db.table("builds").select(BUILD_COLUMN_PROFILES[profile])
+        if submission_status is not None:
+            query = query.eq("submission_status", submission_status.value)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+
+        rows = await fetch_build_rows(query.order("id").limit(page_size))
+        for row in rows:
+            yield Build.from_row(row, profile)
+
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1].id
+
+
+async def count_builds(submission_status: Status | None = None) -> int:
+    """Counts the builds in the database, optionally filtered by submission status, without fetching them."""
+    query = DatabaseManager().table("builds").select("id", count=CountMethod.exact)
+    if submission_status is not None:
+        query = query.eq("submission_status", submission_status.value)
+
+    response = await query.limit(1).execute()
+    return response.count or 0
+
+
+async def get_builds(build_ids: list[int], *, profile: BuildColumnProfile = "full") -> list[Build | None]:
+    """Fetches builds from the database with the given IDs.
+
+    Builds that are not cached are fetched in chunks of `BUILD_ID_CHUNK_SIZE` ids, with at most
+    `MAX_CONCURRENT_BUILD_QUERIES` chunks in flight at a time.
 
+    Args:
+        build_ids: The IDs of the builds to fetch.
+        profile: The columns to load, see `BUILD_COLUMN_PROFILES`.
 
-async def get_builds(build_ids: list[int]) -> list[Build | None]:
-    """Fetches builds from the database with the given IDs."""
+    Returns:
+        The builds in the same order as `build_ids`, with None for builds that were not found.
+    """
     if len(build_ids) == 0:
         return []
 
+    found: dict[int, Build] = {}
+    for build_id in build_ids:
+        if build_id not in found and (cached := build_cache.get(build_id)) is not None:
+            found[build_id] = cached
+    missing_ids = [build_id for build_id in dict.fromkeys(build_ids) if build_id not in found]
+
+    generation = build_cache.generation
     db = DatabaseManager()
-    response = await db.table("builds").select(all_build_columns).in_("id", build_ids).execute()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BUILD_QUERIES)
+
+    async def fetch_chunk(chunk: list[int]) -> list[BuildRow]:
+        async with semaphore:
+            return await fetch_build_rows(db.table("builds").select(BUILD_COLUMN_PROFILES[profile]).in_("id", chunk))
+
+    chunks = [missing_ids[i : i + BUILD_ID_CHUNK_SIZE] for i in range(0, len(missing_ids), BUILD_ID_CHUNK_SIZE)]
+    for chunk_rows in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+        for row in chunk_rows:
+            build = Build.from_row(row, profile)
+            if profile == "full":
+                build_cache.put(build, generation)
+            found[row.id] = build
 
-    builds: list[Build | None] = [None] * len(build_ids)
-    for build_json in response.data:
-        idx = build_ids.index(build_json["id"])
-        builds[idx] = Build.from_json(build_json)
-    return builds
+    return [found.get(build_id) for build_id in build_ids]
 
 
-async def get_unsent_builds(server_id: int) -> list[Build] | None:
-    """Get all the builds that have not been posted on the server"""
+async def get_unsent_builds(server_id: int) -> list[Build]:
+    """Get all the builds that have not been posted on the server, in order of id."""
     db = DatabaseManager()
 
-    # Builds that have not been posted on the server
+    # Builds that have not been posted on the server. The function only returns the columns of the builds table, so
+    # the builds are loaded with their related tables by id.
     response = await db.rpc("get_unsent_builds", {"server_id_input": server_id}).execute()
-    server_unsent_builds = response.data
-    return [Build.from_json(unsent_sub) for unsent_sub in server_unsent_builds]
+    builds = await get_builds(sorted(row["id"] for row in response.data))
+    return [build for build in builds if build is not None]
 
 
 async def main():
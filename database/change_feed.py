@@ -0,0 +1,155 @@
+"""Keeps the in-process caches correct when the database is changed by someone else.
+
+Builds are also edited from the Supabase dashboard and by the api.py process, and those writes do not go through the
+invalidation in `Build.save` and friends. The triggers in the cache_invalidation migration publish every change to a
+cached table with pg_notify, and `ChangeFeed` listens for them on a direct Postgres connection and pushes them into
+the caches with `handle_change`.
+
+Notifications sent while the connection is down are lost, so every time the feed (re)connects, all caches are
+dropped and the in-memory tables are reloaded. The feed only needs a Postgres DSN, so it can be run against a local
+Postgres with the migrations applied, without any network access.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+import asyncpg
+
+from database.builds import build_cache, embed_cache
+from database.message import forget_message, load_message_index, remember_message
+from database.reference_data import invalidate_reference_data
+from database.server_settings import forget_server_settings, load_server_settings, remember_server_settings
+from database.user import forget_all_users, forget_user
+
+CHANGE_FEED_CHANNEL = "cache_invalidation"
+"""The channel the database triggers notify on."""
+CHANGE_FEED_HEARTBEAT = 60
+"""How often (in seconds) to check that the connection is still alive."""
+CHANGE_FEED_MAX_RETRY_DELAY = 5 * 60
+"""The longest time (in seconds) to wait before reconnecting, the delay doubles after every failed attempt."""
+
+BUILD_TABLES = frozenset(
+    {"builds", "doors", "build_restrictions", "build_types", "build_links", "build_creators", "build_versions"}
+)
+"""Tables whose rows are part of a build, keyed by the build id."""
+
+logger = logging.getLogger(__name__)
+
+
+def handle_change(payload: str) -> None:
+    """Applies a change notification to the in-process caches.
+
+    Args:
+        payload: The JSON payload sent by the notify_cache_invalidation trigger, with the table, the operation, the
+            key of the changed row, the old key if an update changed it and, for mirrored tables, the new row.
+    """
+    change: dict[str, Any] = json.loads(payload)
+    table: str = change["table"]
+    key = change.get("key")
+    old_key = change.get("old_key")
+    row = change.get("row")
+    # An update that changes the key (e.g. moves a door to another build) makes the entries under both keys stale
+    keys = [k for k in (key, old_key) if k is not None]
+
+    if table in BUILD_TABLES:
+        for k in keys:
+            build_cache.invalidate(k)
+            embed_cache.invalidate(k)
+    elif table == "messages":
+        if old_key is not None:
+            forget_message(old_key)
+        # Replacing the record also moves it out of the indexes of its old build and server
+        if row is not None:
+            remember_message(row)
+        elif key is not None:
+            forget_message(key)
+    elif table == "server_settings":
+        if old_key is not None:
+            forget_server_settings(old_key)
+        if row is not None:
+            remember_server_settings(row)
+        elif key is not None:
+            forget_server_settings(key)
+    elif table == "users":
+        # Only the in-game names are cached, and they are looked up again on the next miss
+        for k in keys:
+            forget_user(k)
+    elif table in ("restrictions", "types", "versions"):
+        invalidate_reference_data(table)
+    else:
+        logger.debug("Ignoring change to table %s", table)
+
+
+async def resync() -> None:
+    """Drops every cache and reloads the in-memory tables, for when notifications may have been missed."""
+    build_cache.clear()
+    embed_cache.clear()
+    invalidate_reference_data()
+    forget_all_users()
+    await load_server_settings()
+    await load_message_index()
+
+
+class ChangeFeed:
+    """Listens for change notifications in the background, reconnecting with exponential backoff."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.received = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Starts listening in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops listening and closes the connection."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        self.received += 1
+        try:
+            handle_change(payload)
+        except Exception:
+            logger.exception("Failed to handle change notification %s", payload)
+
+    async def _run(self) -> None:
+        delay = 1
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change feed connection failed, reconnecting in %s seconds", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CHANGE_FEED_MAX_RETRY_DELAY)
+
+    async def _listen(self) -> None:
+        """Listens on a single connection until it is closed."""
+        connection: asyncpg.Connection = await asyncpg.connect(self.dsn)
+        try:
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(CHANGE_FEED_CHANNEL, self._on_notification)
+            await resync()
+            logger.info("Listening for database changes")
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=CHANGE_FEED_HEARTBEAT)
+                except TimeoutError:
+                    await connection.fetchval("select 1")
+        finally:
+            await connection.close()
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 
 from supabase_py_async import create_client, AsyncClient
 from bot.config import DEV_MODE
+from database.transport import HttpConfig, create_session
 
 
 class DatabaseManager:
@@ -10,6 +11,8 @@ class DatabaseManager:
 
     _is_setup: bool = False
     _async_client: AsyncClient | None = None
+    http_config: HttpConfig = HttpConfig()
+    """The connection pool, timeout and retry settings of the client, see `HttpConfig`."""
 
     def __new__(cls) -> AsyncClient:
         if not cls._is_setup:
@@ -18,12 +21,18 @@ class DatabaseManager:
         return cls._async_client
 
     @classmethod
-    async def setup(cls) -> None:
+    async def setup(cls, http_config: HttpConfig | None = None) -> None:
         """Connects to the Supabase database.
 
-        This method should be called before using the DatabaseManager instance. This method exists because it is hard to use async code in __init__ or __new__."""
+        This method should be called before using the DatabaseManager instance. This method exists because it is hard to use async code in __init__ or __new__.
+
+        Args:
+            http_config: The connection pool, timeout and retry settings. Defaults to `DatabaseManager.http_config`.
+        """
         if cls._is_setup:
             return
+        if http_config is not None:
+            cls.http_config = http_config
 
         # This is necessary only if you are not running from app.py.
         if DEV_MODE:
@@ -36,6 +45,11 @@ class DatabaseManager:
         if not key:
             raise RuntimeError("Specify SUPABASE_KEY either with an auth.ini or a SUPABASE_KEY environment variable.")
         cls._async_client = await create_client(url, key)
+        # Replace the default PostgREST session (no pool limits, no retries) with one using our settings
+        postgrest = cls._async_client.postgrest
+        default_session = postgrest.session
+        postgrest.session = create_session(default_session.base_url, default_session.headers, cls.http_config)
+        await default_session.aclose()
         cls._is_setup = True
 
         # TODO: Create the tables if they don't exist (helpful for making new instances of the bot)
@@ -2,67 +2,215 @@
 
 from __future__ import annotations
 
-from typing import Literal
+import asyncio
+from collections.abc import AsyncIterator, Iterable, Sequence
+from typing import Any, Literal, cast
 
-from postgrest.base_request_builder import APIResponse, SingleAPIResponse
-from postgrest.types import CountMethod
+from postgrest.base_request_builder import APIResponse
 
-from database.builds import Build, get_builds
+from database.builds import Build, get_builds, BUILD_PAGE_SIZE
 from database.schema import MessageRecord
 from database.utils import utcnow
 from database.database import DatabaseManager
+from database.server_settings import is_vote_channel
+
+MESSAGE_PAGE_SIZE = 1000
+"""The number of rows fetched per request when loading the messages table, which is PostgREST's default row limit."""
+
+
+def _to_record(row: dict[str, Any]) -> MessageRecord:
+    """Converts a row of the messages table to a record with integer ids.
+
+    The message and channel ids are stored as text, so PostgREST returns them as strings, while discord.py (and the
+    rest of the bot) uses integers."""
+    channel_id = row["channel_id"]
+    return cast(
+        MessageRecord,
+        {**row, "message_id": int(row["message_id"]), "channel_id": None if channel_id is None else int(channel_id)},
+    )
+
+
+class MessageIndex:
+    """An in-memory copy of the messages table, indexed by message id, by build id and by (server id, build id).
+
+    The records are shared between the indexes and returned as is by the getters in this module, so they must not be
+    mutated outside of this class.
+    """
+
+    def __init__(self):
+        self.by_message_id: dict[int, MessageRecord] = {}
+        self.by_build_id: dict[int, dict[int, MessageRecord]] = {}
+        self.by_server_and_build_id: dict[tuple[int, int], dict[int, MessageRecord]] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_message_id)
+
+    def add(self, record: MessageRecord) -> None:
+        """Adds a record to the index, replacing the record with the same message id if there is one."""
+        record = _to_record(cast(dict[str, Any], record))
+        message_id = record["message_id"]
+        self.remove(message_id)
+        self.by_message_id[message_id] = record
+        self.by_build_id.setdefault(record["build_id"], {})[message_id] = record
+        self.by_server_and_build_id.setdefault((record["server_id"], record["build_id"]), {})[message_id] = record
+
+    def remove(self, message_id: int | str) -> MessageRecord | None:
+        """Removes a record from the index, returning it if it was in the index."""
+        message_id = int(message_id)
+        record = self.by_message_id.pop(message_id, None)
+        if record is None:
+            return None
+        _pop_nested(self.by_build_id, record["build_id"], message_id)
+        _pop_nested(self.by_server_and_build_id, (record["server_id"], record["build_id"]), message_id)
+        return record
+
+    def clear(self) -> None:
+        """Removes all records from the index."""
+        self.by_message_id.clear()
+        self.by_build_id.clear()
+        self.by_server_and_build_id.clear()
+
+
+def _pop_nested(index: dict[Any, dict[int, MessageRecord]], key: Any, message_id: int) -> None:
+    """Removes a message from a secondary index, dropping the key when it has no messages left."""
+    records = index.get(key)
+    if records is not None:
+        records.pop(message_id, None)
+        if not records:
+            del index[key]
+
+
+_message_index = MessageIndex()
+_is_loaded = False
+_load_lock = asyncio.Lock()
+
+
+async def load_message_index() -> None:
+    """Loads the whole messages table into memory, replacing whatever was loaded before.
+
+    The index is kept up to date by the write functions in this module."""
+    global _is_loaded
+    db = DatabaseManager()
+    records: list[MessageRecord] = []
+    last_message_id: int | None = None
+    while True:
+        query = db.table("messages").select("*")
+        if last_message_id is not None:
+            query = query.gt("message_id", last_message_id)
+        response: APIResponse[MessageRecord] = await query.order("message_id").limit(MESSAGE_PAGE_SIZE).execute()
+        records.extend(response.data)
+        if len(response.data) < MESSAGE_PAGE_SIZE:
+            break
+        last_message_id = response.data[-1]["message_id"]
+
+    _message_index.clear()
+    for record in records:
+        _message_index.add(record)
+    _is_loaded = True
+
+
+async def _ensure_loaded() -> None:
+    """Loads the message index if it has not been loaded yet."""
+    if _is_loaded:
+        return
+    async with _load_lock:
+        if not _is_loaded:
+            await load_message_index()
+
+
+def remember_message(record: MessageRecord) -> None:
+    """Puts a message that was written elsewhere (e.g. by another process) into the index."""
+    _message_index.add(record)
+
+
+def forget_message(message_id: int) -> None:
+    """Removes a message that was deleted elsewhere (e.g. by another process) from the index."""
+    _message_index.remove(message_id)
+
+
+def get_vote_post_build_id(message_id: int) -> int | None:
+    """Gets the build a vote post is about without any I/O, or None if the message is not a tracked vote post.
+
+    This relies on the index loaded by `load_message_index` at startup."""
+    record = _message_index.by_message_id.get(message_id)
+    if record is None or not is_vote_channel(record["channel_id"]):
+        return None
+    return record["build_id"]
 
 
 # TODO: Find better names for these functions, the "message" is not really a discord message, but a record in the database.
 async def get_server_messages(server_id: int) -> list[MessageRecord]:
     """Get all tracked bot messages in a server."""
-    response: APIResponse[MessageRecord] = (
-        await DatabaseManager().table("messages").select("*").eq("server_id", server_id).execute()
-    )
-    return response.data
+    await _ensure_loaded()
+    return [record for record in _message_index.by_message_id.values() if record["server_id"] == server_id]
 
 
 async def get_build_messages(build_id: int) -> list[MessageRecord]:
     """Get all messages for a build."""
-    response: APIResponse[MessageRecord] = (
-        await DatabaseManager().table("messages").select("*").eq("build_id", build_id).execute()
-    )
-    return response.data
+    await _ensure_loaded()
+    return list(_message_index.by_build_id.get(build_id, {}).values())
 
 
 async def get_messages(server_id: int, build_id: int) -> list[MessageRecord]:
     """Get the unique message for a build in a server"""
-    db = DatabaseManager()
-    server_record: APIResponse[MessageRecord] = (
-        await db.table("messages").select("*").eq("server_id", server_id).eq("build_id", build_id).execute()
-    )
-    return server_record.data
+    await _ensure_loaded()
+    return list(_message_index.by_server_and_build_id.get((server_id, build_id), {}).values())
 
 
 async def add_message(
     server_id: int, submission_id: int, channel_id: int, message_id: int, purpose: Literal["build_post"]
 ) -> None:
     """Add a message to the database."""
-    await (
-        DatabaseManager()
-        .table("messages")
-        .insert(
-            {
-                "server_id": server_id,
-                "build_id": submission_id,
-                "channel_id": channel_id,
-                "message_id": message_id,
-                "edited_time": utcnow(),
-                "purpose": purpose,
-            }
-        )
-        .execute()
-    )
+    await add_messages(submission_id, [(server_id, channel_id, message_id)], purpose)
+
+
+async def add_messages(
+    submission_id: int, messages: Iterable[tuple[int, int, int]], purpose: Literal["build_post"]
+) -> None:
+    """Add many messages about the same build to the database in a single insert.
+
+    Args:
+        submission_id: The build the messages are about.
+        messages: The (server_id, channel_id, message_id) of each message.
+        purpose: The purpose of the messages.
+    """
+    edited_time = utcnow()
+    rows = [
+        {
+            "server_id": server_id,
+            "build_id": submission_id,
+            "channel_id": channel_id,
+            "message_id": message_id,
+            "edited_time": edited_time,
+            "purpose": purpose,
+        }
+        for server_id, channel_id, message_id in messages
+    ]
+    if not rows:
+        return
+    response: APIResponse[MessageRecord] = await DatabaseManager().table("messages").insert(rows).execute()
+    for record in response.data:
+        _message_index.add(record)
 
 
 async def update_message_edited_time(message_id: int) -> None:
     """Update the edited time of a message."""
-    await DatabaseManager().table("messages").update({"edited_time": utcnow()}).eq("message_id", message_id).execute()
+    await update_messages_edited_time([message_id])
+
+
+async def update_messages_edited_time(message_ids: Sequence[int]) -> None:
+    """Update the edited time of many messages in a single update."""
+    if not message_ids:
+        return
+    response: APIResponse[MessageRecord] = await (
+        DatabaseManager()
+        .table("messages")
+        .update({"edited_time": utcnow()})
+        .in_("message_id", list(message_ids))
+        .execute()
+    )
+    for record in response.data:
+        _message_index.add(record)
 
 
 async def delete_message(server_id: int, build_id: int) -> list[int]:
@@ -78,35 +226,48 @@ async def delete_message(server_id: int, build_id: int) -> list[int]:
     Returns:
         A list of message ids that were deleted.
     """
-    db = DatabaseManager()
+    # Deletes return the deleted rows, so this is a single `delete ... returning` query
     response: APIResponse[MessageRecord] = (
-        await db.table("messages")
-        .select("message_id", count=CountMethod.exact)
-        .eq("server_id", server_id)
-        .eq("build_id", build_id)
-        .execute()
+        await DatabaseManager().table("messages").delete().eq("server_id", server_id).eq("build_id", build_id).execute()
     )
-    if not response.count:
+    if not response.data:
         raise ValueError("No messages found in this server with the given submission id.")
-    message_ids = [response.data[i]["message_id"] for i in range(response.count)]
-    await db.table("messages").delete().in_("message_id", message_ids).execute()
+    message_ids = [int(record["message_id"]) for record in response.data]
+    for message_id in message_ids:
+        _message_index.remove(message_id)
     return message_ids
 
 
+async def delete_messages(message_ids: Sequence[int]) -> None:
+    """Remove messages from the database by their message ids, e.g. because they were deleted on discord."""
+    if not message_ids:
+        return
+    response: APIResponse[MessageRecord] = (
+        await DatabaseManager().table("messages").delete().in_("message_id", list(message_ids)).execute()
+    )
+    for record in response.data:
+        _message_index.remove(record["message_id"])
+
+
 async def get_outdated_messages(server_id: int) -> list[MessageRecord] | None:
-    """Returns a list of messages that are outdated.
+    """Returns a list of messages that are outdated, i.e. the build was edited after the message was.
 
     Args:
         server_id: The server id to check for outdated messages.
 
     Returns:
-        A list of messages.
+        A list of messages, the ones that have been outdated the longest first.
     """
     db = DatabaseManager()
     # Messages that have been updated since the last submission message update.
     response = await db.rpc("get_outdated_messages", {"server_id_input": server_id}).execute()
-    server_outdated_messages = response.data
-    return server_outdated_messages
+    return [_to_record(row) for row in response.data]
+
+
+async def get_unsent_build_ids(server_id: int) -> list[int]:
+    """Gets the ids of all the builds without messages in this server, in chronological (id) order."""
+    response = await DatabaseManager().rpc("get_unsent_builds", {"server_id_input": server_id}).execute()
+    return sorted(row["id"] for row in response.data)
 
 
 async def get_unsent_builds(server_id: int) -> list[Build]:
@@ -119,13 +280,35 @@ async def get_unsent_builds(server_id: int) -> list[Build]:
     Returns:
         A list of messages
     """
-    db = DatabaseManager()
-    response = await db.rpc("get_unsent_builds", {"server_id_input": server_id}).execute()
-    build_ids = [row["id"] for row in response.data]
-    builds = await get_builds(build_ids)
+    builds = await get_builds(await get_unsent_build_ids(server_id))
     return [build for build in builds if build is not None]
 
 
+async def iter_unsent_builds(
+    server_id: int, *, after_build_id: int | None = None, page_size: int = BUILD_PAGE_SIZE
+) -> AsyncIterator[Build]:
+    """
+    Iterates over the builds without messages in this server, in order of id.
+
+    Only the ids of the unsent builds are fetched up front, the builds themselves are fetched `page_size` at a time.
+
+    Args:
+        server_id: The server id to check for.
+        after_build_id: Only yield builds with a greater id, e.g. to resume from a checkpoint.
+        page_size: The number of builds to fetch per request.
+
+    Yields:
+        Build objects.
+    """
+    build_ids = await get_unsent_build_ids(server_id)
+    if after_build_id is not None:
+        build_ids = [build_id for build_id in build_ids if build_id > after_build_id]
+    for i in range(0, len(build_ids), page_size):
+        for build in await get_builds(build_ids[i : i + page_size]):
+            if build is not None:
+                yield build
+
+
 async def get_build_id_by_message(message_id: int) -> int | None:
     """
     Get the build id by the message id.
@@ -136,15 +319,9 @@ async def get_build_id_by_message(message_id: int) -> int | None:
     Returns:
         The build id of the message.
     """
-    db = DatabaseManager()
-    response: SingleAPIResponse[MessageRecord] | None = (
-        await db.table("messages")
-        .select("build_id", count=CountMethod.exact)
-        .eq("message_id", message_id)
-        .maybe_single()
-        .execute()
-    )
-    return response.data["build_id"] if response else None
+    await _ensure_loaded()
+    record = _message_index.by_message_id.get(message_id)
+    return record["build_id"] if record else None
 
 
 if __name__ == "__main__":
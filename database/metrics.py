@@ -0,0 +1,186 @@
+"""Latency, row count and error metrics for every PostgREST request, grouped by table (or function) and operation.
+
+The metrics are recorded by `InstrumentedTransport` from the request line and response headers alone, so the response
+body is never parsed and the overhead is a few dictionary operations per request. Latencies go into fixed histogram
+buckets, so memory does not grow with traffic.
+"""
+
+from __future__ import annotations
+
+import bisect
+import time
+from typing import override
+
+import httpx
+
+from bot.tracing import record_db_time
+from database.query_budget import note_query
+
+LATENCY_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The upper bounds (in seconds) of the latency histogram buckets. Slower requests go into an extra overflow bucket."""
+
+QueryKey = tuple[str, str]
+"""The table (or `rpc/<function>`) and the operation (select, insert, upsert, update, delete or call)."""
+
+
+class QueryStats:
+    """The metrics of one kind of query."""
+
+    __slots__ = ("count", "errors", "rows", "total_seconds", "max_seconds", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        """The rows returned, or affected by writes that asked for an exact count (other writes do not report it)."""
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        """The number of requests per latency bucket (not cumulative)."""
+
+    def observe(self, seconds: float, rows: int | None, error: bool) -> None:
+        """Records one request."""
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if rows is not None:
+            self.rows += rows
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimates a latency quantile (in seconds) as the upper bound of the bucket it falls in."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return upper_bound
+        return self.max_seconds
+
+
+query_stats: dict[QueryKey, QueryStats] = {}
+"""The metrics of every kind of query made by this process since it started (or since `reset_query_stats`)."""
+
+
+def reset_query_stats() -> None:
+    """Forgets all recorded metrics."""
+    query_stats.clear()
+
+
+def classify_request(request: httpx.Request) -> QueryKey:
+    """Gets the table (or function) and operation of a PostgREST request."""
+    target = request.url.path.strip("/")
+    if target.startswith("rest/v1/"):
+        target = target.removeprefix("rest/v1/")
+    match request.method:
+        case "GET" | "HEAD":
+            operation = "select"
+        case "POST" if target.startswith("rpc/"):
+            operation = "call"
+        case "POST":
+            operation = "upsert" if "resolution=" in request.headers.get("prefer", "") else "insert"
+        case "PATCH":
+            operation = "update"
+        case "DELETE":
+            operation = "delete"
+        case method:
+            operation = method.lower()
+    return target, operation
+
+
+def parse_row_count(content_range: str | None, operation: str = "select") -> int | None:
+    """Gets the number of rows in a response from its Content-Range header, e.g. `0-24/*` or `*/0`.
+
+    PostgREST only sends a row range for reads. Writes get `*/*`, or `*/<count>` when an exact count was requested, so
+    the rows a write affected are only known if it asked for a count.
+
+    Returns:
+        The number of rows, or None if the response does not say.
+    """
+    if not content_range:
+        return None
+    row_range, _, total = content_range.partition("/")
+    if row_range == "*":
+        if operation in ("select", "call"):
+            return 0
+        return int(total) if total.isdigit() else None
+    first, _, last = row_range.partition("-")
+    try:
+        return int(last) - int(first) + 1
+    except ValueError:
+        return None
+
+
+def record_query(key: QueryKey, seconds: float, rows: int | None, error: bool) -> None:
+    """Records one request in `query_stats`."""
+    stats = query_stats.get(key)
+    if stats is None:
+        stats = query_stats[key] = QueryStats()
+    stats.observe(seconds, rows, error)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport, recording every request in `query_stats`, the current query budget and the current trace.
+
+    The latency is measured until the response headers arrive, and includes any retries done by the wrapped transport.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = classify_request(request)
+        note_query(key)
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            elapsed = time.perf_counter() - start
+            record_query(key, elapsed, None, True)
+            record_db_time(elapsed)
+            raise
+        elapsed = time.perf_counter() - start
+        record_db_time(elapsed)
+        record_query(
+            key,
+            elapsed,
+            parse_row_count(response.headers.get("content-range"), key[1]),
+            response.status_code >= 400,
+        )
+        return response
+
+    @override
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def format_prometheus() -> str:
+    """Formats `query_stats` in the Prometheus text exposition format."""
+    lines = [
+        "# HELP db_query_duration_seconds Latency of PostgREST requests, until the response headers arrive.",
+        "# TYPE db_query_duration_seconds histogram",
+    ]
+    for (target, operation), stats in sorted(query_stats.items()):
+        labels = f'target="{target}",operation="{operation}"'
+        cumulative = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, stats.buckets):
+            cumulative += bucket_count
+            lines.append(f'db_query_duration_seconds_bucket{{{labels},le="{upper_bound}"}} {cumulative}')
+        lines.append(f'db_query_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+        lines.append(f"db_query_duration_seconds_sum{{{labels}}} {stats.total_seconds}")
+        lines.append(f"db_query_duration_seconds_count{{{labels}}} {stats.count}")
+
+    for name, help_text, attr in (
+        ("db_query_rows_total", "Rows returned by PostgREST reads, or affected by writes with an exact count.", "rows"),
+        ("db_query_errors_total", "PostgREST requests that failed or returned an error status.", "errors"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (target, operation), stats in sorted(query_stats.items()):
+            lines.append(f'{name}{{target="{target}",operation="{operation}"}} {getattr(stats, attr)}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+-- Inserts or updates a build and all of its related rows in a single transaction.
+--
+-- build_data is the JSON document produced by Build.as_dict() (with null values removed), with the creators given as
+-- user ids (creator_ids), because the bot resolves in-game names itself with a cache (see database/user.py). Keys that
+-- are missing from the document leave the corresponding columns untouched on update. The junction tables
+-- (restrictions, types, versions, links and creators) are replaced by what the document contains.
+create or replace function upsert_build (build_data jsonb)
+returns setof builds
+as $$
+  declare
+    build_id_ bigint := (build_data->>'id')::bigint;
+    information_ jsonb := coalesce(build_data->'information', '{}'::jsonb);
+    unknown_wiring jsonb;
+    unknown_component jsonb;
+    unknown_restrictions jsonb := '{}'::jsonb;
+    unknown_types jsonb;
+  begin
+    if build_data ? 'door_type' and jsonb_typeof(build_data->'door_type') <> 'array' then
+      raise exception 'Door type must be a list';
+    end if;
+
+    -- builds
+    if build_id_ is null then
+      insert into builds (submission_status, record_category, information, edited_time, width, height, depth,
+                          completion_time, category, server_info, submitter_id)
+      values (
+        coalesce((build_data->>'submission_status')::int, 0),
+        build_data->>'record_category',
+        information_,
+        coalesce((build_data->>'edited_time')::timestamp, current_timestamp),
+        (build_data->>'width')::int,
+        (build_data->>'height')::int,
+        (build_data->>'depth')::int,
+        build_data->>'completion_time',
+        build_data->>'category',
+        build_data->'server_info',
+        (build_data->>'submitter_id')::bigint
+      )
+      returning id into build_id_;
+    else
+      update builds set
+        submission_status = case when build_data ? 'submission_status' then (build_data->>'submission_status')::int else submission_status end,
+        record_category = case when build_data ? 'record_category' then build_data->>'record_category' else record_category end,
+        edited_time = case when build_data ? 'edited_time' then (build_data->>'edited_time')::timestamp else edited_time end,
+        width = case when build_data ? 'width' then (build_data->>'width')::int else width end,
+        height = case when build_data ? 'height' then (build_data->>'height')::int else height end,
+        depth = case when build_data ? 'depth' then (build_data->>'depth')::int else depth end,
+        completion_time = case when build_data ? 'completion_time' then build_data->>'completion_time' else completion_time end,
+        category = case when build_data ? 'category' then build_data->>'category' else category end,
+        server_info = case when build_data ? 'server_info' then build_data->'server_info' else server_info end,
+        submitter_id = case when build_data ? 'submitter_id' then (build_data->>'submitter_id')::bigint else submitter_id end
+      where id = build_id_;
+      if not found then
+        raise exception 'Build % not found', build_id_;
+      end if;
+    end if;
+
+    -- Subcategory table
+    case build_data->>'category'
+      when 'Door' then
+        insert into doors (build_id, orientation, door_width, door_height, door_depth, normal_opening_time,
+                           normal_closing_time, visible_opening_time, visible_closing_time)
+        values (
+          build_id_,
+          build_data->>'door_orientation_type',
+          (build_data->>'door_width')::int,
+          (build_data->>'door_height')::int,
+          (build_data->>'door_depth')::int,
+          (build_data->>'normal_opening_time')::bigint,
+          (build_data->>'normal_closing_time')::bigint,
+          (build_data->>'visible_opening_time')::bigint,
+          (build_data->>'visible_closing_time')::bigint
+        )
+        on conflict (build_id) do update set
+          orientation = case when build_data ? 'door_orientation_type' then excluded.orientation else doors.orientation end,
+          door_width = case when build_data ? 'door_width' then excluded.door_width else doors.door_width end,
+          door_height = case when build_data ? 'door_height' then excluded.door_height else doors.door_height end,
+          door_depth = case when build_data ? 'door_depth' then excluded.door_depth else doors.door_depth end,
+          normal_opening_time = case when build_data ? 'normal_opening_time' then excluded.normal_opening_time else doors.normal_opening_time end,
+          normal_closing_time = case when build_data ? 'normal_closing_time' then excluded.normal_closing_time else doors.normal_closing_time end,
+          visible_opening_time = case when build_data ? 'visible_opening_time' then excluded.visible_opening_time else doors.visible_opening_time end,
+          visible_closing_time = case when build_data ? 'visible_closing_time' then excluded.visible_closing_time else doors.visible_closing_time end;
+      when 'Extender', 'Utility', 'Entrance' then
+        raise exception 'Saving % builds is not implemented', build_data->>'category';
+      else
+        raise exception 'Build category must be set';
+    end case;
+
+    -- Restrictions
+    if build_data ?| array['wiring_placement_restrictions', 'component_restrictions', 'miscellaneous_restrictions'] then
+      delete from build_restrictions where build_id = build_id_;
+      insert into build_restrictions (build_id, restriction_id)
+      select distinct build_id_, restrictions.id
+      from restrictions
+      where restrictions.name in (
+        select jsonb_array_elements_text(coalesce(build_data->'wiring_placement_restrictions', '[]'::jsonb))
+        union all
+        select jsonb_array_elements_text(coalesce(build_data->'component_restrictions', '[]'::jsonb))
+        union all
+        select jsonb_array_elements_text(coalesce(build_data->'miscellaneous_restrictions', '[]'::jsonb))
+      );
+    end if;
+
+    select coalesce(jsonb_agg(t.name order by t.idx), '[]'::jsonb) into unknown_wiring
+    from jsonb_array_elements_text(coalesce(build_data->'wiring_placement_restrictions', '[]'::jsonb)) with ordinality as t(name, idx)
+    where not exists (select 1 from restrictions where restrictions.name = t.name and restrictions.type = 'wiring-placement');
+
+    select coalesce(jsonb_agg(t.name order by t.idx), '[]'::jsonb) into unknown_component
+    from jsonb_array_elements_text(coalesce(build_data->'component_restrictions', '[]'::jsonb)) with ordinality as t(name, idx)
+    where not exists (select 1 from restrictions where restrictions.name = t.name and restrictions.type = 'component');
+
+    -- TODO: miscellaneous restrictions?
+    if jsonb_array_length(unknown_wiring) > 0 then
+      unknown_restrictions := unknown_restrictions || jsonb_build_object('wiring_placement_restrictions', unknown_wiring);
+    end if;
+    if jsonb_array_length(unknown_component) > 0 then
+      unknown_restrictions := unknown_restrictions || jsonb_build_object('component_restrictions', unknown_component);
+    end if;
+    if unknown_restrictions <> '{}'::jsonb then
+      information_ := information_ || jsonb_build_object('unknown_restrictions', unknown_restrictions);
+    end if;
+
+    -- Types
+    delete from build_types where build_id = build_id_;
+    insert into build_types (build_id, type_id)
+    select distinct build_id_, types.id
+    from types
+    where types.build_category = build_data->>'category'
+    and types.name in (select jsonb_array_elements_text(coalesce(build_data->'door_type', '["Regular"]'::jsonb)));
+
+    select coalesce(jsonb_agg(t.name order by t.idx), '[]'::jsonb) into unknown_types
+    from jsonb_array_elements_text(coalesce(build_data->'door_type', '[]'::jsonb)) with ordinality as t(name, idx)
+    where not exists (select 1 from types where types.name = t.name and types.build_category = build_data->>'category');
+
+    if jsonb_array_length(unknown_types) > 0 then
+      information_ := information_ || jsonb_build_object('unknown_patterns', unknown_types);
+    end if;
+
+    -- Store any unknown restrictions or types
+    update builds set information = information_ where id = build_id_;
+
+    -- Links
+    delete from build_links where build_id = build_id_;
+    insert into build_links (build_id, url, media_type)
+    select build_id_, links.url, links.media_type
+    from (
+      select jsonb_array_elements_text(coalesce(build_data->'image_urls', '[]'::jsonb)) as url, 'image' as media_type
+      union all
+      select jsonb_array_elements_text(coalesce(build_data->'video_urls', '[]'::jsonb)), 'video'
+      union all
+      select jsonb_array_elements_text(coalesce(build_data->'world_download_urls', '[]'::jsonb)), 'world_download'
+    ) as links
+    on conflict do nothing;
+
+    -- Creators, already resolved to user ids by the caller
+    if build_data ? 'creator_ids' then
+      delete from build_creators where build_id = build_id_;
+      insert into build_creators (build_id, user_id)
+      select distinct build_id_, t.user_id::int
+      from jsonb_array_elements_text(build_data->'creator_ids') as t(user_id)
+      on conflict do nothing;
+    end if;
+
+    -- Versions, no error is raised if a version is not found
+    delete from build_versions where build_id = build_id_;
+    insert into build_versions (build_id, version_id)
+    select distinct build_id_, versions.id
+    from versions
+    where versions.full_name_temp in (select jsonb_array_elements_text(coalesce(build_data->'functional_versions', '[]'::jsonb)))
+    on conflict do nothing;
+
+    return query select * from builds where id = build_id_;
+  end;
+$$ language plpgsql;
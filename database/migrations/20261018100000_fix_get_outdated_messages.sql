@@ -0,0 +1,14 @@
+-- get_outdated_messages still referred to the submissions table and its old column names.
+create or replace function get_outdated_messages (server_id_input bigint)
+returns setof messages
+as $$
+  begin
+    return query select messages.*
+    from messages join builds
+    on (messages.build_id = builds.id)
+    where messages.edited_time < builds.edited_time
+    and messages.server_id = server_id_input
+    and builds.submission_status = 1  -- accepted
+    order by messages.edited_time;
+  end;
+$$ language plpgsql;
@@ -0,0 +1,12 @@
+-- Progress of posting all unsent builds to a server, so that the job can resume after a restart.
+create table if not exists
+  backfill_jobs (
+    server_id bigint primary key not null,
+    status text not null default 'running' check (status in ('running', 'paused', 'done', 'failed')),
+    last_build_id bigint,
+    posted int not null default 0,
+    total int not null default 0,
+    error text,
+    started_at timestamp not null default current_timestamp,
+    updated_at timestamp not null default current_timestamp
+  );
@@ -0,0 +1,77 @@
+-- Publishes every change to a cached table on the cache_invalidation channel, so that every process can drop its
+-- stale cache entries (see database/change_feed.py). Changes made from the dashboard are published too.
+--
+-- The payload is {"table": ..., "op": ..., "key": ...}, where key is the value of the column named by the first trigger
+-- argument. If an update changes the key (e.g. moves a door to another build), the payload also contains the old key as
+-- old_key, whose cache entries are stale too. If the second trigger argument is 'row', the payload also contains the new
+-- row (null on delete), for small tables that are mirrored in memory rather than invalidated.
+create or replace function notify_cache_invalidation ()
+returns trigger
+as $$
+  declare
+    row_ jsonb := case when tg_op = 'DELETE' then to_jsonb(old) else to_jsonb(new) end;
+    payload jsonb;
+  begin
+    payload := jsonb_build_object('table', tg_table_name, 'op', tg_op, 'key', row_->tg_argv[0]);
+    if tg_op = 'UPDATE' and to_jsonb(old)->tg_argv[0] is distinct from row_->tg_argv[0] then
+      payload := payload || jsonb_build_object('old_key', to_jsonb(old)->tg_argv[0]);
+    end if;
+    if tg_nargs > 1 and tg_argv[1] = 'row' then
+      payload := payload || jsonb_build_object('row', case when tg_op = 'DELETE' then null else row_ end);
+    end if;
+    perform pg_notify('cache_invalidation', payload::text);
+    return null;
+  end;
+$$ language plpgsql;
+
+create or replace trigger builds_notify_cache_invalidation
+after insert or update or delete on builds
+for each row execute function notify_cache_invalidation('id');
+
+create or replace trigger doors_notify_cache_invalidation
+after insert or update or delete on doors
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger build_restrictions_notify_cache_invalidation
+after insert or update or delete on build_restrictions
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger build_types_notify_cache_invalidation
+after insert or update or delete on build_types
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger build_links_notify_cache_invalidation
+after insert or update or delete on build_links
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger build_creators_notify_cache_invalidation
+after insert or update or delete on build_creators
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger build_versions_notify_cache_invalidation
+after insert or update or delete on build_versions
+for each row execute function notify_cache_invalidation('build_id');
+
+create or replace trigger messages_notify_cache_invalidation
+after insert or update or delete on messages
+for each row execute function notify_cache_invalidation('message_id', 'row');
+
+create or replace trigger server_settings_notify_cache_invalidation
+after insert or update or delete on server_settings
+for each row execute function notify_cache_invalidation('server_id', 'row');
+
+create or replace trigger users_notify_cache_invalidation
+after insert or update or delete on users
+for each row execute function notify_cache_invalidation('id');
+
+create or replace trigger restrictions_notify_cache_invalidation
+after insert or update or delete on restrictions
+for each row execute function notify_cache_invalidation('id');
+
+create or replace trigger types_notify_cache_invalidation
+after insert or update or delete on types
+for each row execute function notify_cache_invalidation('id');
+
+create or replace trigger versions_notify_cache_invalidation
+after insert or update or delete on versions
+for each row execute function notify_cache_invalidation('id');
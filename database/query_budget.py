@@ -0,0 +1,134 @@
+"""Counts the database queries made by each command or listener invocation, to catch N+1 query patterns.
+
+A `QueryBudget` is bound to the current context with `query_budget` (or the `budgeted` decorator), and every PostgREST
+request made in that context is added to it by `InstrumentedTransport`. Tasks created inside the context (e.g. by
+`fan_out`) inherit the budget, so their queries are counted too. When an invocation makes more queries than its budget,
+a warning with the list of queries is logged, or, in strict mode, `QueryBudgetExceeded` is raised so that tests can lock
+in the round-trip counts of hot commands.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, ParamSpec, TypeVar
+
+from bot.config import DEFAULT_QUERY_BUDGET, STRICT_QUERY_BUDGETS
+
+if TYPE_CHECKING:
+    from database.metrics import QueryKey
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when an invocation makes more queries than its budget."""
+
+
+class QueryBudget:
+    """The queries made by one invocation, and how many it is allowed to make."""
+
+    __slots__ = ("name", "limit", "queries")
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.queries: list[QueryKey] = []
+
+    @property
+    def exceeded(self) -> bool:
+        return len(self.queries) > self.limit
+
+    def report(self) -> str:
+        """Describes the queries made, with the most repeated (and so most likely N+1) queries first."""
+        lines = [f"{self.name} made {len(self.queries)} queries (budget: {self.limit}):"]
+        for (target, operation), count in Counter(self.queries).most_common():
+            lines.append(f"  {count:>3} x {operation} {target}")
+        return "\n".join(lines)
+
+
+_current_budget: ContextVar[QueryBudget | None] = ContextVar("query_budget", default=None)
+
+
+def _check(budget: QueryBudget, strict: bool | None) -> None:
+    if not budget.exceeded:
+        return
+    if strict if strict is not None else STRICT_QUERY_BUDGETS:
+        raise QueryBudgetExceeded(budget.report())
+    logger.warning(budget.report())
+
+
+def note_query(key: QueryKey) -> None:
+    """Adds a query to the budget of the current invocation, if there is one."""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.queries.append(key)
+
+
+def start_query_budget(name: str, limit: int | None = None) -> QueryBudget:
+    """Binds a new budget to the current context. Use `finish_query_budget` to check it.
+
+    This is for hooks that cannot wrap the invocation in `query_budget`, like discord.py's before and after invoke
+    hooks.
+    """
+    budget = QueryBudget(name, limit if limit is not None else DEFAULT_QUERY_BUDGET)
+    _current_budget.set(budget)
+    return budget
+
+
+def finish_query_budget(strict: bool | None = None) -> QueryBudget | None:
+    """Unbinds the budget of the current context and checks it.
+
+    Args:
+        strict: Whether to raise `QueryBudgetExceeded` instead of logging a warning. Defaults to `STRICT_QUERY_BUDGETS`.
+
+    Returns:
+        The budget that was bound to the current context, or None if there was none.
+    """
+    budget = _current_budget.get()
+    _current_budget.set(None)
+    if budget is not None:
+        _check(budget, strict)
+    return budget
+
+
+@contextmanager
+def query_budget(name: str, limit: int | None = None, *, strict: bool | None = None) -> Iterator[QueryBudget]:
+    """Counts the queries made inside the block, and checks them against a budget when the block exits.
+
+    Args:
+        name: What is being counted, used in the report.
+        limit: The maximum number of queries. Defaults to `DEFAULT_QUERY_BUDGET`.
+        strict: Whether to raise `QueryBudgetExceeded` instead of logging a warning. Defaults to `STRICT_QUERY_BUDGETS`.
+
+    Yields:
+        The budget, whose `queries` can be inspected after the block (e.g. to assert an exact round-trip count).
+    """
+    budget = QueryBudget(name, limit if limit is not None else DEFAULT_QUERY_BUDGET)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+    _check(budget, strict)
+
+
+def budgeted(limit: int | None = None) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+    """Decorates a coroutine function (e.g. a listener) so that every call is checked against a query budget."""
+
+    def decorator(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with query_budget(func.__qualname__, limit):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
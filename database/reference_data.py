@@ -0,0 +1,79 @@
+"""Cached access to the small reference tables (restrictions, types and versions).
+
+These tables are only changed by hand, so they are fetched once and kept in memory for `REFERENCE_DATA_TTL` seconds.
+Concurrent callers share a single in-flight request, and the caches can be dropped early with
+`invalidate_reference_data`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from typing import Generic, Literal, TypeVar
+
+from async_lru import alru_cache
+from postgrest.base_request_builder import APIResponse
+
+from database.database import DatabaseManager
+from database.schema import RestrictionRecord, TypeRecord, VersionsRecord
+
+REFERENCE_DATA_TTL = 24 * 60 * 60
+"""How long (in seconds) a reference table is kept in memory before it is fetched again."""
+
+ReferenceTable = Literal["restrictions", "types", "versions"]
+T = TypeVar("T", RestrictionRecord, TypeRecord, VersionsRecord)
+
+
+class Vocabulary(Generic[T]):
+    """A snapshot of a reference table, with lookup maps by id and by name."""
+
+    __slots__ = ("records", "by_id", "by_name", "_by_lower_name")
+
+    def __init__(self, records: list[T], name_of: Callable[[T], str]):
+        self.records: list[T] = records
+        self.by_id: Mapping[int, T] = {record["id"]: record for record in records}
+        self.by_name: Mapping[str, T] = {name_of(record): record for record in records}
+        self._by_lower_name: Mapping[str, T] = {name.lower(): record for name, record in self.by_name.items()}
+
+    def get_by_name(self, name: str, *, case_sensitive: bool = True) -> T | None:
+        """Gets a record by its name, or None if it is not in the table."""
+        if case_sensitive:
+            return self.by_name.get(name)
+        return self._by_lower_name.get(name.lower())
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+@alru_cache(maxsize=1, ttl=REFERENCE_DATA_TTL)
+async def fetch_restrictions() -> Vocabulary[RestrictionRecord]:
+    """Fetches all restrictions from the database."""
+    response: APIResponse[RestrictionRecord] = await DatabaseManager().table("restrictions").select("*").execute()
+    return Vocabulary(response.data, lambda restriction: restriction["name"])
+
+
+@alru_cache(maxsize=1, ttl=REFERENCE_DATA_TTL)
+async def fetch_types() -> Vocabulary[TypeRecord]:
+    """Fetches all types (patterns) from the database."""
+    response: APIResponse[TypeRecord] = await DatabaseManager().table("types").select("*").execute()
+    return Vocabulary(response.data, lambda type_: type_["name"])
+
+
+@alru_cache(maxsize=1, ttl=REFERENCE_DATA_TTL)
+async def fetch_versions() -> Vocabulary[VersionsRecord]:
+    """Fetches all versions from the database."""
+    response: APIResponse[VersionsRecord] = await DatabaseManager().table("versions").select("*").execute()
+    return Vocabulary(response.data, lambda version: version["full_name_temp"])
+
+
+def invalidate_reference_data(table: ReferenceTable | None = None) -> None:
+    """Drops the cached copy of a reference table, so that the next access fetches it again.
+
+    Args:
+        table: The table to invalidate. If None, all reference tables are invalidated.
+    """
+    if table is None or table == "restrictions":
+        fetch_restrictions.cache_clear()
+    if table is None or table == "types":
+        fetch_types.cache_clear()
+    if table is None or table == "versions":
+        fetch_versions.cache_clear()
@@ -46,6 +46,19 @@ class MessageRecord(TypedDict):
     edited_time: str
 
 
+class BackfillJobRecord(TypedDict):
+    """A record of a backfill job in the database, which posts all unsent builds to a server."""
+
+    server_id: int
+    status: BackfillStatus
+    last_build_id: int | None  # The last build that was posted, builds are posted in order of id
+    posted: int
+    total: int
+    error: str | None
+    started_at: str
+    updated_at: str
+
+
 class DoorRecord(TypedDict):
     """A record of a door in the database."""
 
@@ -131,5 +144,7 @@ BUILD_TYPES: Sequence[BuildType] = cast(Sequence[BuildType], get_args(BuildType)
 DoorOrientationName: TypeAlias = Literal["Door", "Skydoor", "Trapdoor"]
 DOOR_ORIENTATION_NAMES = cast(Sequence[DoorOrientationName], get_args(DoorOrientationName))
 
+BackfillStatus: TypeAlias = Literal["running", "paused", "done", "failed"]
+
 ChannelPurpose: TypeAlias = Literal["Smallest", "Fastest", "First", "Builds", "Vote"]
 CHANNEL_PURPOSES = cast(Sequence[ChannelPurpose], get_args(ChannelPurpose))
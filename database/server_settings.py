@@ -1,7 +1,13 @@
-"""Some functions related to storing and changing server ids for sending records."""
+"""Some functions related to storing and changing server ids for sending records.
 
-from postgrest.base_request_builder import SingleAPIResponse
-from postgrest.types import CountMethod
+The whole server_settings table is kept in memory (it has one small row per server), so reads are dictionary lookups.
+It is loaded at startup by `load_server_settings` and kept up to date by the update functions in this module.
+"""
+
+import asyncio
+from collections.abc import Sequence
+
+from postgrest.base_request_builder import APIResponse
 
 from database.database import DatabaseManager
 from database.schema import ServerSettingRecord, DbSettingKey, ChannelPurpose, CHANNEL_PURPOSES
@@ -19,6 +25,16 @@ PURPOSE_TO_SETTING: dict[ChannelPurpose, DbSettingKey] = {
 SETTING_TO_PURPOSE: dict[DbSettingKey, ChannelPurpose] = {value: key for key, value in PURPOSE_TO_SETTING.items()}
 assert set(PURPOSE_TO_SETTING.keys()) == set(CHANNEL_PURPOSES), "The mapping is not exhaustive!"
 
+SERVER_ID_CHUNK_SIZE = 100
+"""The maximum number of server ids put into a single `in_` filter, to keep the request URL short."""
+
+_server_settings: dict[int, ServerSettingRecord] = {}
+"""An in-memory copy of the server_settings table, keyed by server id."""
+_is_loaded = False
+_load_lock = asyncio.Lock()
+_vote_channel_ids: set[int] = set()
+"""The vote channels of all servers, derived from `_server_settings`."""
+
 
 def get_setting_name(channel_purpose: ChannelPurpose) -> DbSettingKey:
     """Maps a channel purpose to the column name in the database."""
@@ -30,41 +46,128 @@ def get_purpose_name(setting_name: DbSettingKey) -> ChannelPurpose:
     return SETTING_TO_PURPOSE[setting_name]
 
 
+async def load_server_settings() -> None:
+    """Loads the settings of every server into memory, replacing whatever was loaded before."""
+    global _is_loaded
+    response: APIResponse[ServerSettingRecord] = await DatabaseManager().table("server_settings").select("*").execute()
+    _server_settings.clear()
+    _server_settings.update({record["server_id"]: record for record in response.data})
+    _index_vote_channels()
+    _is_loaded = True
+
+
+def _index_vote_channels() -> None:
+    """Rebuilds the set of vote channels from the in-memory server settings."""
+    _vote_channel_ids.clear()
+    _vote_channel_ids.update(
+        channel_id for record in _server_settings.values() if (channel_id := record.get("voting_channel_id"))
+    )
+
+
+async def _ensure_loaded() -> None:
+    """Loads the server settings if they have not been loaded yet."""
+    if _is_loaded:
+        return
+    async with _load_lock:
+        if not _is_loaded:
+            await load_server_settings()
+
+
+def is_vote_channel(channel_id: int) -> bool:
+    """Checks whether a channel is the vote channel of any server, without any I/O.
+
+    This relies on the settings loaded by `load_server_settings` at startup."""
+    return channel_id in _vote_channel_ids
+
+
+def remember_server_settings(record: ServerSettingRecord) -> None:
+    """Puts a server's settings that were changed elsewhere (e.g. by another process) into the in-memory copy."""
+    _server_settings[record["server_id"]] = record
+    _index_vote_channels()
+
+
+def forget_server_settings(server_id: int) -> None:
+    """Removes a server's settings that were deleted elsewhere (e.g. by another process) from the in-memory copy."""
+    _server_settings.pop(server_id, None)
+    _index_vote_channels()
+
+
+def invalidate_server_settings() -> None:
+    """Drops the in-memory server settings, so that the next read loads them from the database again."""
+    global _is_loaded
+    _is_loaded = False
+
+
 async def get_server_setting(server_id: int, channel_purpose: ChannelPurpose) -> int | None:
     """Gets the channel id of the specified purpose for a server. The channels fetched are always GuildMessageable unless the server admins changed them."""
+    await _ensure_loaded()
     setting_name = get_setting_name(channel_purpose)
-    response: SingleAPIResponse[ServerSettingRecord] | None = (
-        await DatabaseManager()
-        .table("server_settings")
-        .select(setting_name, count=CountMethod.exact)
-        .eq("server_id", server_id)
-        .maybe_single()
-        .execute()
-    )
-    if response is None:
+    settings = _server_settings.get(server_id)
+    if settings is None:
         return None
-    return response.data.get(setting_name)
+    return settings.get(setting_name)
+
+
+async def get_server_setting_for_servers(server_ids: Sequence[int], channel_purpose: ChannelPurpose) -> list[int]:
+    """Gets the channel ids of the specified purpose for many servers at once.
+
+    Servers without a channel set for the purpose are skipped. If the server settings are in memory, no query is made,
+    otherwise the purpose column is fetched for all servers with one `in_` query per `SERVER_ID_CHUNK_SIZE` servers.
+
+    Args:
+        server_ids: The servers to get the channel ids for.
+        channel_purpose: The purpose of the channels.
+
+    Returns:
+        The channel ids, in the same order as `server_ids`.
+    """
+    setting_name = get_setting_name(channel_purpose)
+    if _is_loaded:
+        records = [_server_settings.get(server_id) for server_id in server_ids]
+    else:
+        db = DatabaseManager()
+        chunks = [server_ids[i : i + SERVER_ID_CHUNK_SIZE] for i in range(0, len(server_ids), SERVER_ID_CHUNK_SIZE)]
+        responses: list[APIResponse[ServerSettingRecord]] = await asyncio.gather(
+            *(
+                db.table("server_settings").select("server_id", setting_name).in_("server_id", chunk).execute()
+                for chunk in chunks
+            )
+        )
+        fetched = {record["server_id"]: record for response in responses for record in response.data}
+        records = [fetched.get(server_id) for server_id in server_ids]
+
+    channel_ids: list[int] = []
+    for record in records:
+        if record is not None and (channel_id := record.get(setting_name)):
+            channel_ids.append(channel_id)
+    return channel_ids
 
 
 async def get_server_settings(server_id: int) -> dict[ChannelPurpose, int]:
     """Gets the settings for a server."""
-    response: SingleAPIResponse[ServerSettingRecord] | None = (
-        await DatabaseManager().table("server_settings").select("*").eq("server_id", server_id).maybe_single().execute()
-    )
-    if response is None:
+    await _ensure_loaded()
+    settings = _server_settings.get(server_id)
+    if settings is None:
         return {}
 
-    settings = response.data
     return {get_purpose_name(setting_name): id for setting_name, id in settings.items() if setting_name != "server_id"}  # type: ignore
 
 
 async def update_server_setting(server_id: int, channel_purpose: ChannelPurpose, value: int | None) -> None:
     """Updates a setting for a server."""
     setting_name = get_setting_name(channel_purpose)
-    await DatabaseManager().table("server_settings").upsert({"server_id": server_id, setting_name: value}).execute()
+    response: APIResponse[ServerSettingRecord] = (
+        await DatabaseManager().table("server_settings").upsert({"server_id": server_id, setting_name: value}).execute()
+    )
+    _server_settings.update({record["server_id"]: record for record in response.data})
+    _index_vote_channels()
 
 
 async def update_server_settings(server_id: int, channel_purposes: dict[ChannelPurpose, int | None]) -> None:
     """Updates a list of settings for a server."""
     settings = {get_setting_name(purpose): value for purpose, value in channel_purposes.items()}
-    await DatabaseManager().table("server_settings").upsert({"server_id": server_id, **settings}).execute()
+    response: APIResponse[ServerSettingRecord] = (
+        await DatabaseManager().table("server_settings").upsert({"server_id": server_id, **settings}).execute()
+    )
+    _server_settings.update({record["server_id"]: record for record in response.data})
+    _index_vote_channels()
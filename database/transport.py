@@ -0,0 +1,101 @@
+"""The HTTP transport used to talk to PostgREST, with connection pool limits, timeouts and retries."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import NamedTuple, override
+
+import httpx
+
+from database.metrics import InstrumentedTransport
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+"""Methods that can be sent again without changing the result. PostgREST uses POST for inserts and RPC calls."""
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+"""Responses that mean the request did not reach PostgREST (or it was overloaded), so it is safe to send it again."""
+
+logger = logging.getLogger(__name__)
+
+
+class HttpConfig(NamedTuple):
+    """How the database client manages its HTTP connections."""
+
+    max_connections: int = 20
+    """The maximum number of open connections to PostgREST."""
+    max_keepalive_connections: int = 10
+    """The maximum number of idle connections kept open for reuse."""
+    keepalive_expiry: float = 30.0
+    """How long (in seconds) an idle connection is kept open."""
+    http2: bool = True
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    """How long (in seconds) to wait for a response. This bounds how long one slow query can stall a command."""
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+    """How long (in seconds) to wait for a free connection when all `max_connections` are in use."""
+    retries: int = 2
+    """How many times an idempotent request is sent again after a connection error, a timeout or a 502/503/504."""
+    retry_backoff: float = 0.1
+    """The base delay (in seconds) before a retry. The delay doubles after every attempt and is jittered."""
+    retry_backoff_max: float = 2.0
+    """The longest delay (in seconds) before a retry."""
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout, read=self.read_timeout, write=self.write_timeout, pool=self.pool_timeout
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class RetryTransport(httpx.AsyncHTTPTransport):
+    """A connection-pooling transport that retries idempotent requests with jittered exponential backoff."""
+
+    def __init__(self, config: HttpConfig):
+        super().__init__(http2=config.http2, limits=config.limits)
+        self.config = config
+
+    def backoff(self, attempt: int) -> float:
+        """The delay before the given retry (starting from 0), with "full jitter" so that retries do not bunch up."""
+        return random.uniform(0, min(self.config.retry_backoff_max, self.config.retry_backoff * 2**attempt))
+
+    @override
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT_METHODS:
+            return await super().handle_async_request(request)
+
+        for attempt in range(self.config.retries + 1):
+            is_last_attempt = attempt == self.config.retries
+            try:
+                response = await super().handle_async_request(request)
+            except httpx.TransportError as e:
+                if is_last_attempt:
+                    raise
+                logger.warning("%s %s failed (%r), retrying", request.method, request.url.path, e)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or is_last_attempt:
+                    return response
+                await response.aclose()
+                logger.warning("%s %s returned %s, retrying", request.method, request.url.path, response.status_code)
+            await asyncio.sleep(self.backoff(attempt))
+        raise AssertionError("unreachable")
+
+
+def create_session(base_url: httpx.URL | str, headers: httpx.Headers, config: HttpConfig) -> httpx.AsyncClient:
+    """Creates an HTTP client for PostgREST using the given configuration, recording metrics for every request."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=config.timeout,
+        follow_redirects=True,
+        transport=InstrumentedTransport(RetryTransport(config)),
+    )
@@ -1,4 +1,6 @@
 """Handles user data and operations."""
+from collections.abc import Iterable, Sequence
+from typing import Any
 from uuid import UUID
 
 import requests
@@ -6,6 +8,54 @@ import requests
 from database.utils import utcnow
 from database.database import DatabaseManager
 
+_user_ids_by_ign: dict[str, int] = {}
+"""An in-memory cache of in-game names to user ids. User ids never change, so entries only need to be dropped when
+a user's in-game name changes."""
+
+
+def remember_users(users: Iterable[dict[str, Any]]) -> None:
+    """Adds users (rows of the users table, which have at least an id and an ign) to the in-game name cache."""
+    for user in users:
+        if user.get("ign") is not None:
+            _user_ids_by_ign.setdefault(user["ign"], user["id"])
+
+
+def forget_user(user_id: int) -> None:
+    """Removes a user from the in-game name cache, e.g. because their in-game name was changed elsewhere."""
+    for ign in [ign for ign, id_ in _user_ids_by_ign.items() if id_ == user_id]:
+        del _user_ids_by_ign[ign]
+
+
+def forget_all_users() -> None:
+    """Empties the in-game name cache."""
+    _user_ids_by_ign.clear()
+
+
+async def get_or_create_user_ids(igns: Sequence[str]) -> list[int]:
+    """Gets the user ids for a list of in-game names, creating users for names that are not in the database yet.
+
+    Names that are not cached are looked up with a single query, and the missing users are created with a single
+    insert, regardless of how many names are given.
+
+    Args:
+        igns: The in-game names.
+
+    Returns:
+        The user ids, in the same order as `igns`.
+    """
+    uncached = [ign for ign in dict.fromkeys(igns) if ign not in _user_ids_by_ign]
+    if uncached:
+        db = DatabaseManager()
+        response = await db.table("users").select("id", "ign").in_("ign", uncached).order("id").execute()
+        remember_users(response.data)
+
+        missing = [ign for ign in uncached if ign not in _user_ids_by_ign]
+        if missing:
+            response = await db.table("users").insert([{"ign": ign} for ign in missing]).execute()
+            remember_users(response.data)
+
+    return [_user_ids_by_ign[ign] for ign in igns]
+
 
 async def add_user(user_id: int = None, ign: str = None) -> int:
     """Add a user to the database.
@@ -22,6 +72,7 @@ async def add_user(user_id: int = None, ign: str = None) -> int:
 
     db = DatabaseManager()
     response = await db.table("users").insert({"discord_id": user_id, "ign": ign}).execute()
+    remember_users(response.data)
     return response.data[0]["id"]
 
 
@@ -46,7 +97,14 @@ async def link_minecraft_account(user_id: int, code: str) -> bool:
     # TODO: This currently does not check if the ign is already in use without a UUID or discord ID given.
     response = await db.table("users").update({"minecraft_uuid": minecraft_uuid, "ign": minecraft_username}).eq("discord_id", user_id).execute()
     if not response.data:
-        await db.table("users").insert({"discord_id": user_id, "minecraft_uuid": minecraft_uuid, "ign": minecraft_username}).execute()
+        response = await (
+            db.table("users")
+            .insert({"discord_id": user_id, "minecraft_uuid": minecraft_uuid, "ign": minecraft_username})
+            .execute()
+        )
+    for user in response.data:
+        forget_user(user["id"])
+    remember_users(response.data)
     return True
 
 
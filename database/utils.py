@@ -1,11 +1,17 @@
 """Utility functions for the database module."""
 
 import os
+from collections.abc import AsyncIterable, AsyncIterator
 from datetime import datetime, timezone
-from typing import Any
 
-import requests
-from requests_toolbelt import MultipartEncoder
+import aiohttp
+
+DEFAULT_CATBOX_URL = "https://catbox.moe/user/api.php"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+"""The size (in bytes) of the chunks files are streamed in."""
+UPLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+"""Uploads of large videos can take minutes, so only a stalled connection times out."""
+
 
 def utcnow() -> str:
     """Returns the current time in UTC in the format of a string."""
@@ -14,29 +20,57 @@ def utcnow() -> str:
     return formatted_time
 
 
+async def stream_url(session: aiohttp.ClientSession, url: str) -> AsyncIterator[bytes]:
+    """Downloads a file in chunks of `UPLOAD_CHUNK_SIZE` bytes, without holding the whole file in memory.
+
+    Args:
+        session: The session to download with.
+        url: The URL of the file, e.g. `discord.Attachment.url`.
+
+    Yields:
+        The chunks of the file.
+    """
+    async with session.get(url, timeout=UPLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
 # A minimal version of https://github.com/yukinotenshi/pyupload
-def upload_to_catbox(filename: str, file: bytes, mimetype: str) -> str:
+async def upload_to_catbox(
+    filename: str,
+    file: bytes | AsyncIterable[bytes],
+    mimetype: str,
+    *,
+    session: aiohttp.ClientSession,
+    url: str | None = None,
+) -> str:
     """Uploads a file to catbox.moe.
 
+    The file can be given as an async iterable of chunks (see `stream_url`), in which case it is streamed to catbox
+    with chunked transfer encoding as it is read, so large videos are never held in memory and the event loop is never
+    blocked.
+
     Args:
         filename: The name of the file.
-        file: The file to upload.
+        file: The file to upload, either whole or as an async iterable of chunks.
         mimetype: The mimetype of the file.
+        session: The session to upload with.
+        url: The upload endpoint. Defaults to the CATBOX_URL environment variable, or catbox.moe's API.
 
     Returns:
         The link to the uploaded file.
+
+    Raises:
+        aiohttp.ClientResponseError: If catbox rejected the upload.
     """
-    catbox_url = "https://catbox.moe/user/api.php"
-    data = {
-        'reqtype': 'fileupload',
-        'userhash': os.getenv('CATBOX_USERHASH'),
-        'fileToUpload': (filename, file, mimetype)
-    }
-    encoder = MultipartEncoder(fields=data)
-    response = requests.post(
-        catbox_url,
-        data=encoder,
-        headers={'Content-Type': encoder.content_type}
-    )
-
-    return response.text
+    catbox_url = url or os.getenv("CATBOX_URL", DEFAULT_CATBOX_URL)
+    form = aiohttp.FormData()
+    form.add_field("reqtype", "fileupload")
+    if userhash := os.getenv("CATBOX_USERHASH"):
+        form.add_field("userhash", userhash)
+    form.add_field("fileToUpload", file, filename=filename, content_type=mimetype)
+
+    async with session.post(catbox_url, data=form, timeout=UPLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        return (await response.text()).strip()
@@ -0,0 +1,34 @@
+"""Fixtures for the tests, which run against `FakePostgrest` instead of a Supabase project."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest, connect, disconnect, reset_caches, unload_tables
+from database.message import load_message_index
+from database.server_settings import load_server_settings
+
+
+@pytest.fixture
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    event_loop = asyncio.new_event_loop()
+    yield event_loop
+    event_loop.close()
+
+
+@pytest.fixture
+def postgrest(loop: asyncio.AbstractEventLoop) -> Iterator[FakePostgrest]:
+    """An empty fake PostgREST that `DatabaseManager` is connected to, with the in-memory tables loaded (empty)."""
+    fake = FakePostgrest()
+    client = loop.run_until_complete(connect(fake))
+    reset_caches()
+    loop.run_until_complete(load_server_settings())
+    loop.run_until_complete(load_message_index())
+    yield fake
+    loop.run_until_complete(client.aclose())
+    disconnect()
+    reset_caches()
+    unload_tables()
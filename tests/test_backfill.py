@@ -0,0 +1,67 @@
+"""Tests of `BackfillCog.run_job` against `FakePostgrest`, with a stand-in for `SubmissionsCog.post_build`."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest
+from bot.submission import backfill
+from bot.submission.backfill import BackfillCog
+from database.backfill import get_backfill_job, start_backfill_job
+from database.builds import Build
+
+
+class FakeSubmissions:
+    """Records the builds posted, sending nothing for the builds in `failing`."""
+
+    def __init__(self, failing: frozenset[int] = frozenset()):
+        self.posted: list[int] = []
+        self.failing = failing
+
+    async def post_build(self, build: Build, *, guilds: Any = None) -> list[Any]:
+        assert build.id is not None
+        if build.id in self.failing:
+            return []
+        self.posted.append(build.id)
+        return [SimpleNamespace(id=build.id)]
+
+
+@pytest.fixture
+def unsent(postgrest: FakePostgrest, monkeypatch: pytest.MonkeyPatch) -> FakePostgrest:
+    """Five builds in one server, of which builds 3 to 5 are not posted yet."""
+    monkeypatch.setattr(backfill, "BACKFILL_POST_INTERVAL", 0)
+    postgrest.seed(5, servers=1, messages_per_server=2)
+    return postgrest
+
+
+def run_job(loop: asyncio.AbstractEventLoop, submissions: FakeSubmissions) -> None:
+    bot = SimpleNamespace(get_cog=lambda name: submissions)
+    cog = BackfillCog(bot)  # type: ignore[arg-type]
+    loop.run_until_complete(cog.run_job(SimpleNamespace(id=1)))  # type: ignore[arg-type]
+
+
+def test_run_job_posts_unsent_builds(unsent: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    loop.run_until_complete(start_backfill_job(1, 3))
+    submissions = FakeSubmissions(failing=frozenset({4}))
+    run_job(loop, submissions)
+
+    assert submissions.posted == [3, 5]
+    job = loop.run_until_complete(get_backfill_job(1))
+    assert job is not None
+    assert (job["status"], job["posted"], job["last_build_id"]) == ("done", 2, 5)
+
+
+def test_run_job_resumes_after_checkpoint(unsent: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    loop.run_until_complete(start_backfill_job(1, 3))
+    unsent.tables["backfill_jobs"][0].update({"last_build_id": 4, "posted": 2})
+    submissions = FakeSubmissions()
+    run_job(loop, submissions)
+
+    assert submissions.posted == [5]
+    job = loop.run_until_complete(get_backfill_job(1))
+    assert job is not None
+    assert (job["status"], job["posted"]) == ("done", 3)
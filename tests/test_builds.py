@@ -0,0 +1,55 @@
+"""Tests of the build and embed caches in `database.builds`."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+from postgrest import AsyncQueryRequestBuilder
+
+from benchmarks.build_conversion import make_build_json
+from benchmarks.fake_postgrest import FakePostgrest
+from database import builds
+from database.build_rows import BuildRow, fetch_build_rows
+from database.builds import Build, build_cache, embed_cache, get_unsent_builds, invalidate_cached_build
+from database.enums import Status
+
+
+def test_embed_cache_is_keyed_by_status():
+    embed_cache.clear()
+    pending = Build.from_json({**make_build_json(1), "submission_status": Status.PENDING})
+    confirmed = Build.from_json({**make_build_json(1), "submission_status": Status.CONFIRMED})
+    assert pending.edited_time == confirmed.edited_time
+
+    # A render of a stale copy (e.g. racing with confirm()) must not be served for the confirmed build
+    assert (pending.generate_embed().title or "").startswith("Pending: ")
+    assert not (confirmed.generate_embed().title or "").startswith("Pending: ")
+
+
+def test_load_racing_with_write_is_not_cached(
+    postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop, monkeypatch: pytest.MonkeyPatch
+):
+    postgrest.seed(1)
+
+    async def fetch_then_write(query: AsyncQueryRequestBuilder[Any]) -> list[BuildRow]:
+        rows = await fetch_build_rows(query)
+        # A save of the build finishes while the response of the load is in flight
+        invalidate_cached_build(rows[0].id)
+        return rows
+
+    monkeypatch.setattr(builds, "fetch_build_rows", fetch_then_write)
+    assert loop.run_until_complete(Build.from_id(1)) is not None
+    assert build_cache.get(1) is None
+
+    monkeypatch.undo()
+    assert loop.run_until_complete(Build.from_id(1)) is not None
+    assert build_cache.get(1) is not None
+
+
+def test_get_unsent_builds(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    # The function returns bare builds rows, without the related tables
+    postgrest.seed(4, servers=1, messages_per_server=2)
+    unsent = loop.run_until_complete(get_unsent_builds(1))
+    assert [build.id for build in unsent] == [3, 4]
+    assert all(build.door_width == 2 and build.creators_ign for build in unsent)
@@ -0,0 +1,253 @@
+"""Tests of `database.change_feed`.
+
+The `handle_change` tests run against `FakePostgrest`. The LISTEN/NOTIFY tests apply the cache_invalidation migration
+to a real Postgres, on stand-in tables in a throwaway schema, and are skipped unless `TEST_DATABASE_URL` is set to the
+DSN of a local database, e.g. `postgresql://postgres@localhost/postgres`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+import asyncpg
+import pytest
+
+from benchmarks.build_conversion import make_build_json
+from benchmarks.fake_postgrest import FakePostgrest
+from database.builds import Build, build_cache
+from database.change_feed import CHANGE_FEED_CHANNEL, ChangeFeed, handle_change
+from database.message import get_build_id_by_message, get_build_messages
+from database.reference_data import fetch_restrictions
+from database.server_settings import get_server_setting, is_vote_channel
+from database.user import get_or_create_user_ids
+
+MIGRATION = Path(__file__).parents[1] / "database" / "migrations" / "20261018120000_cache_invalidation_notify.sql"
+
+TEST_SCHEMA = "change_feed_test"
+
+STAND_IN_TABLES = """
+create table builds (id int primary key, title text);
+create table doors (build_id int, orientation text);
+create table build_restrictions (build_id int, restriction_id int);
+create table build_types (build_id int, type_id int);
+create table build_links (build_id int, url text);
+create table build_creators (build_id int, user_id int);
+create table build_versions (build_id int, version_id int);
+create table messages (
+    message_id bigint primary key, server_id bigint, build_id int, channel_id bigint, edited_time text, purpose text
+);
+create table server_settings (server_id bigint primary key, builds_channel_id bigint, voting_channel_id bigint);
+create table users (id int primary key, ign text);
+create table restrictions (id int primary key, name text);
+create table types (id int primary key, name text);
+create table versions (id int primary key, full_name_temp text);
+"""
+"""The tables the migration puts triggers on, with only the columns the tests use."""
+
+
+def change(table: str, key: Any, **fields: Any) -> str:
+    """Creates a payload like the ones sent by the notify_cache_invalidation trigger."""
+    return json.dumps({"table": table, "op": "UPDATE", "key": key, **fields})
+
+
+def message_row(message_id: int, build_id: int, server_id: int = 1, channel_id: int = 1001) -> dict[str, Any]:
+    return {
+        "message_id": message_id,
+        "server_id": server_id,
+        "build_id": build_id,
+        "channel_id": channel_id,
+        "edited_time": "2026-01-01T00:00:00",
+        "purpose": "build_post",
+    }
+
+
+def cache_build(build_id: int) -> None:
+    build_cache.put(Build.from_json(make_build_json(build_id)))
+
+
+def test_build_change_invalidates_build(postgrest: FakePostgrest):
+    cache_build(1)
+    cache_build(2)
+    handle_change(change("doors", 1))
+    assert build_cache.get(1) is None
+    assert build_cache.get(2) is not None
+
+
+def test_build_change_invalidates_old_key(postgrest: FakePostgrest):
+    cache_build(1)
+    cache_build(2)
+    handle_change(change("build_creators", 2, old_key=1))
+    assert len(build_cache) == 0
+
+
+def test_message_insert_and_delete(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    handle_change(change("messages", 10, row=message_row(10, build_id=1)))
+    assert loop.run_until_complete(get_build_id_by_message(10)) == 1
+
+    handle_change(change("messages", 10, row=None))
+    assert loop.run_until_complete(get_build_id_by_message(10)) is None
+
+
+def test_message_moved_to_other_build(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    handle_change(change("messages", 10, row=message_row(10, build_id=1)))
+    handle_change(change("messages", 10, row=message_row(10, build_id=2)))
+    assert loop.run_until_complete(get_build_messages(1)) == []
+    assert [record["message_id"] for record in loop.run_until_complete(get_build_messages(2))] == [10]
+
+
+def test_message_id_changed(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    handle_change(change("messages", 10, row=message_row(10, build_id=1)))
+    handle_change(change("messages", 11, old_key=10, row=message_row(11, build_id=1)))
+    assert loop.run_until_complete(get_build_id_by_message(10)) is None
+    assert [record["message_id"] for record in loop.run_until_complete(get_build_messages(1))] == [11]
+
+
+def test_server_settings_change(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    row = {"server_id": 1, "builds_channel_id": 1001, "voting_channel_id": 2001}
+    handle_change(change("server_settings", 1, row=row))
+    assert loop.run_until_complete(get_server_setting(1, "Vote")) == 2001
+    assert is_vote_channel(2001)
+
+    handle_change(change("server_settings", 1, row=None))
+    assert loop.run_until_complete(get_server_setting(1, "Vote")) is None
+    assert not is_vote_channel(2001)
+
+
+def test_user_rename_invalidates_ign(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    postgrest.tables["users"] = [{"id": 1, "ign": "alice"}]
+    assert loop.run_until_complete(get_or_create_user_ids(["alice"])) == [1]
+
+    # alice renames herself to bob, and someone else takes the name
+    postgrest.tables["users"] = [{"id": 1, "ign": "bob"}, {"id": 2, "ign": "alice"}]
+    handle_change(change("users", 1))
+    assert loop.run_until_complete(get_or_create_user_ids(["alice", "bob"])) == [2, 1]
+
+
+def test_reference_data_change(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    postgrest.tables["restrictions"] = [
+        {"id": 1, "name": "Seamless", "build_category": "Door", "type": "wiring-placement"}
+    ]
+    assert len(loop.run_until_complete(fetch_restrictions())) == 1
+
+    postgrest.tables["restrictions"].append(
+        {"id": 2, "name": "Full Flush", "build_category": "Door", "type": "wiring-placement"}
+    )
+    assert len(loop.run_until_complete(fetch_restrictions())) == 1
+    handle_change(change("restrictions", 2))
+    assert len(loop.run_until_complete(fetch_restrictions())) == 2
+
+
+def test_unknown_table_is_ignored(postgrest: FakePostgrest):
+    cache_build(1)
+    handle_change(change("verification_codes", 1))
+    assert build_cache.get(1) is not None
+
+
+@asynccontextmanager
+async def notifying_database(dsn: str) -> AsyncIterator[tuple[asyncpg.Connection, ChangeFeed]]:
+    """Applies the migration to stand-in tables in a throwaway schema, with a `ChangeFeed` handling its notifications.
+
+    Yields:
+        A connection to make changes with, and the feed.
+    """
+    connection: asyncpg.Connection = await asyncpg.connect(dsn, server_settings={"search_path": TEST_SCHEMA})
+    listener: asyncpg.Connection = await asyncpg.connect(dsn)
+    feed = ChangeFeed(dsn)
+    try:
+        await connection.execute(f"drop schema if exists {TEST_SCHEMA} cascade; create schema {TEST_SCHEMA};")
+        await connection.execute(STAND_IN_TABLES)
+        await connection.execute(MIGRATION.read_text())
+        await listener.add_listener(CHANGE_FEED_CHANNEL, feed._on_notification)  # pyright: ignore[reportPrivateUsage]
+        yield connection, feed
+    finally:
+        await listener.close()
+        await connection.execute(f"drop schema if exists {TEST_SCHEMA} cascade")
+        await connection.close()
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    """Waits until a notification has been handled, as they arrive asynchronously."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def database_url() -> str:
+    dsn = os.environ.get("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return dsn
+
+
+def test_notify_build_changes(database_url: str, postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    async def run():
+        async with notifying_database(database_url) as (connection, feed):
+            await connection.execute(
+                "insert into builds values (1, 'A'), (2, 'B'); insert into doors values (1, 'Door')"
+            )
+            await wait_for(lambda: feed.received == 3)
+            cache_build(1)
+            cache_build(2)
+            cache_build(3)
+
+            await connection.execute("update builds set title = 'C' where id = 1")
+            await wait_for(lambda: feed.received == 4)
+            assert build_cache.get(1) is None
+            assert build_cache.get(2) is not None
+
+            cache_build(1)
+            await connection.execute("update doors set build_id = 2 where build_id = 1")
+            await wait_for(lambda: feed.received == 5)
+            assert build_cache.get(1) is None
+            assert build_cache.get(2) is None
+            assert build_cache.get(3) is not None
+
+    loop.run_until_complete(run())
+
+
+def test_notify_message_changes(database_url: str, postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    async def run():
+        async with notifying_database(database_url) as (connection, feed):
+            await connection.execute(
+                "insert into messages values (10, 1, 1, 1001, '2026-01-01T00:00:00', 'build_post')"
+            )
+            await wait_for(lambda: feed.received == 1)
+            assert await get_build_id_by_message(10) == 1
+
+            await connection.execute("update messages set build_id = 2 where message_id = 10")
+            await wait_for(lambda: feed.received == 2)
+            assert await get_build_messages(1) == []
+            assert await get_build_id_by_message(10) == 2
+
+            await connection.execute("update messages set message_id = 11 where message_id = 10")
+            await wait_for(lambda: feed.received == 3)
+            assert await get_build_id_by_message(10) is None
+            assert await get_build_id_by_message(11) == 2
+
+            await connection.execute("delete from messages")
+            await wait_for(lambda: feed.received == 4)
+            assert await get_build_messages(2) == []
+
+    loop.run_until_complete(run())
+
+
+def test_notify_user_changes(database_url: str, postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    async def run():
+        async with notifying_database(database_url) as (connection, feed):
+            postgrest.tables["users"] = [{"id": 1, "ign": "alice"}]
+            assert await get_or_create_user_ids(["alice"]) == [1]
+
+            postgrest.tables["users"] = [{"id": 1, "ign": "bob"}]
+            await connection.execute("insert into users values (1, 'alice'); update users set ign = 'bob' where id = 1")
+            await wait_for(lambda: feed.received == 2)
+            assert await get_or_create_user_ids(["bob"]) == [1]
+            assert await get_or_create_user_ids(["alice"]) == [2]
+
+    loop.run_until_complete(run())
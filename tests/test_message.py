@@ -0,0 +1,41 @@
+"""Tests of the in-memory message index in `database.message`."""
+
+from __future__ import annotations
+
+import asyncio
+
+from benchmarks.fake_postgrest import FakePostgrest
+from database.message import (
+    forget_message,
+    get_build_id_by_message,
+    get_messages,
+    get_vote_post_build_id,
+    load_message_index,
+)
+from database.server_settings import load_server_settings
+
+
+def test_text_ids_are_looked_up_by_int(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    # The message and channel ids are text columns, so PostgREST returns them as strings
+    postgrest.tables["server_settings"] = [{"server_id": 1, "builds_channel_id": 1001, "voting_channel_id": 2001}]
+    postgrest.tables["messages"] = [
+        {
+            "server_id": 1,
+            "build_id": 7,
+            "channel_id": "2001",
+            "message_id": "536004554743873556",
+            "edited_time": "2026-01-01T00:00:00",
+            "purpose": "build_post",
+        }
+    ]
+    loop.run_until_complete(load_server_settings())
+    loop.run_until_complete(load_message_index())
+
+    assert loop.run_until_complete(get_build_id_by_message(536004554743873556)) == 7
+    assert get_vote_post_build_id(536004554743873556) == 7
+    [record] = loop.run_until_complete(get_messages(1, 7))
+    assert (record["message_id"], record["channel_id"]) == (536004554743873556, 2001)
+
+    # Change notifications carry the key as text too
+    forget_message("536004554743873556")  # pyright: ignore[reportArgumentType]
+    assert loop.run_until_complete(get_build_id_by_message(536004554743873556)) is None
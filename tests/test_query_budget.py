@@ -0,0 +1,73 @@
+"""Tests of `database.query_budget` against `FakePostgrest`."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest
+from bot.fanout import fan_out
+from database import query_budget as query_budget_module
+from database.builds import BUILD_ID_CHUNK_SIZE, Build, get_builds
+from database.query_budget import QueryBudgetExceeded, budgeted, query_budget
+
+
+@pytest.fixture
+def builds(postgrest: FakePostgrest) -> FakePostgrest:
+    """Enough builds for `get_builds` to fetch them in three chunks."""
+    postgrest.seed(2 * BUILD_ID_CHUNK_SIZE + 1)
+    return postgrest
+
+
+def test_counts_round_trips(builds: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    build_ids = list(range(1, 2 * BUILD_ID_CHUNK_SIZE + 2))
+    round_trips = builds.round_trips
+    with query_budget("get_builds", 3, strict=True) as budget:
+        loop.run_until_complete(get_builds(build_ids))
+    assert budget.queries == [("builds", "select")] * 3
+    assert builds.round_trips - round_trips == 3
+
+    # The builds are cached now
+    with query_budget("get_builds", 0, strict=True) as budget:
+        loop.run_until_complete(get_builds(build_ids))
+    assert budget.queries == []
+
+
+def test_strict_budget_raises(builds: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    build_ids = list(range(1, 2 * BUILD_ID_CHUNK_SIZE + 2))
+    with (
+        pytest.raises(QueryBudgetExceeded, match=r"made 3 queries \(budget: 2\)"),
+        query_budget("get_builds", 2, strict=True),
+    ):
+        loop.run_until_complete(get_builds(build_ids))
+
+
+def test_lenient_budget_warns(builds: FakePostgrest, loop: asyncio.AbstractEventLoop, caplog: pytest.LogCaptureFixture):
+    with (
+        caplog.at_level(logging.WARNING, logger="database.query_budget"),
+        query_budget("get_builds", 2, strict=False) as budget,
+    ):
+        loop.run_until_complete(get_builds(list(range(1, 2 * BUILD_ID_CHUNK_SIZE + 2))))
+    assert len(budget.queries) == 3
+    assert "  3 x select builds" in caplog.text
+
+
+def test_fan_out_tasks_share_budget(builds: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    # Each task loads one build, and every load is counted against the budget of the caller
+    with query_budget("fan_out", strict=True) as budget:
+        loop.run_until_complete(fan_out([1, 2, 3, 4], Build.from_id, limit=2))
+    assert budget.queries == [("builds", "select")] * 4
+
+
+def test_budgeted_listener(builds: FakePostgrest, loop: asyncio.AbstractEventLoop, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(query_budget_module, "STRICT_QUERY_BUDGETS", True)
+
+    @budgeted(4)
+    async def load_each(build_ids: list[int]) -> None:
+        await fan_out(build_ids, Build.from_id)
+
+    loop.run_until_complete(load_each([1, 2, 3, 4]))
+    with pytest.raises(QueryBudgetExceeded, match=r"made 5 queries \(budget: 4\)"):
+        loop.run_until_complete(load_each([5, 6, 7, 8, 9]))
@@ -0,0 +1,74 @@
+"""Tests of `ReconcilerCog.reconcile_once` against `FakePostgrest`, with a stand-in for the Discord side."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest
+from bot.submission.reconciler import ReconcilerCog
+
+
+class FakeBot:
+    """Records the messages edited through partial messages, failing the edits of `broken` messages."""
+
+    def __init__(self, broken: frozenset[int] = frozenset()):
+        self.guilds = [SimpleNamespace(id=1)]
+        self.edited: list[int] = []
+        self.broken = broken
+
+    def get_partial_messageable(self, channel_id: int) -> Any:
+        bot = self
+
+        class Message:
+            def __init__(self, message_id: int):
+                self.id = message_id
+
+            async def edit(self, *, embed: discord.Embed) -> None:
+                if self.id in bot.broken:
+                    raise RuntimeError("Missing permissions")
+                bot.edited.append(self.id)
+
+        return SimpleNamespace(get_partial_message=Message)
+
+
+@pytest.fixture
+def outdated(postgrest: FakePostgrest) -> FakePostgrest:
+    """Three builds posted in one server, all edited after their posts. Build 2 cannot be rendered."""
+    postgrest.seed(3, servers=1, messages_per_server=3)
+    for build in postgrest.tables["builds"]:
+        build["edited_time"] = "2026-02-01T00:00:00"
+    postgrest.tables["builds"][1]["category"] = "Entrance"
+    return postgrest
+
+
+def message_id(build_id: int) -> int:
+    return 1_000_000 + build_id
+
+
+def test_unrenderable_build_is_skipped(outdated: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    bot = FakeBot()
+    cog = ReconcilerCog(bot)  # type: ignore[arg-type]
+    loop.run_until_complete(cog.reconcile_once(budget=2))
+    assert bot.edited == [message_id(1)]
+    assert cog.stats.failed == 1
+
+    # The post of build 2 no longer heads the batch, and is not counted again
+    loop.run_until_complete(cog.reconcile_once(budget=2))
+    assert bot.edited == [message_id(1), message_id(3)]
+    assert cog.stats.failed == 1
+    assert cog.stats.backlog == 0
+
+
+def test_failed_edit_is_counted_once(outdated: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    outdated.tables["builds"][1]["category"] = "Door"
+    bot = FakeBot(broken=frozenset({message_id(1)}))
+    cog = ReconcilerCog(bot)  # type: ignore[arg-type]
+    for _ in range(3):
+        loop.run_until_complete(cog.reconcile_once(budget=1))
+    assert bot.edited == [message_id(2), message_id(3)]
+    assert cog.stats.failed == 1
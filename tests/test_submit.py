@@ -0,0 +1,127 @@
+"""Tests of `SubmissionsCog.confirm_record` against `FakePostgrest`, with a stand-in for the Discord side."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+import pytest
+
+from benchmarks.fake_postgrest import FakePostgrest
+from bot import config
+from bot.submission.submit import PENDING_LIST_SIZE, SubmissionsCog
+from database.builds import Build
+from database.enums import Status
+from database.message import get_build_id_by_message, load_message_index
+from database.server_settings import load_server_settings
+
+VOTE_POST_ID = 536004554743873556
+
+
+class FakeBot:
+    """Records the messages deleted through partial messages."""
+
+    def __init__(self):
+        self.deleted: list[int] = []
+
+    def get_partial_messageable(self, channel_id: int) -> Any:
+        bot = self
+
+        class Message:
+            def __init__(self, message_id: int):
+                self.id = message_id
+
+            async def delete(self) -> None:
+                bot.deleted.append(self.id)
+
+        return SimpleNamespace(get_partial_message=Message)
+
+
+class FakeContext:
+    """Records the embed the running message ends up with."""
+
+    def __init__(self):
+        self.embed: discord.Embed | None = None
+
+    async def send(self, *, embed: discord.Embed) -> Any:
+        return SimpleNamespace(edit=self.edit)
+
+    async def edit(self, *, embed: discord.Embed) -> None:
+        self.embed = embed
+
+
+@pytest.fixture
+def vote_post(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop) -> FakePostgrest:
+    """A pending build 1 with a vote post in the vote channel of server 1."""
+    postgrest.seed(1, servers=1)
+    postgrest.tables["builds"][0]["submission_status"] = Status.PENDING
+    postgrest.tables["messages"] = [
+        {
+            "server_id": 1,
+            "build_id": 1,
+            "channel_id": "2001",
+            "message_id": str(VOTE_POST_ID),
+            "edited_time": "2026-01-01T00:00:00",
+            "purpose": "build_post",
+        }
+    ]
+    loop.run_until_complete(load_server_settings())
+    loop.run_until_complete(load_message_index())
+    return postgrest
+
+
+def reaction(emoji: str, *, user_id: int = config.OWNER_ID) -> discord.RawReactionActionEvent:
+    data: Any = {
+        "message_id": str(VOTE_POST_ID),
+        "channel_id": "2001",
+        "guild_id": "1",
+        "user_id": str(user_id),
+        "type": 0,
+    }
+    return discord.RawReactionActionEvent(data, discord.PartialEmoji(name=emoji), "REACTION_ADD")
+
+
+def test_thumbs_up_confirms_vote_post(vote_post: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    bot = FakeBot()
+    cog = SubmissionsCog(bot)  # type: ignore[arg-type]
+    posted: list[int | None] = []
+
+    async def post_build(build: Build) -> None:
+        posted.append(build.id)
+
+    cog.post_build = post_build  # type: ignore[method-assign]
+    loop.run_until_complete(cog.confirm_record(reaction("👍")))
+
+    assert vote_post.tables["builds"][0]["submission_status"] == Status.CONFIRMED
+    assert posted == [1]
+    assert bot.deleted == [VOTE_POST_ID]
+    assert loop.run_until_complete(get_build_id_by_message(VOTE_POST_ID)) is None
+
+
+def test_other_reactions_are_ignored(vote_post: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    bot = FakeBot()
+    cog = SubmissionsCog(bot)  # type: ignore[arg-type]
+    loop.run_until_complete(cog.confirm_record(reaction("👍", user_id=1)))
+    loop.run_until_complete(cog.confirm_record(reaction("👎")))
+
+    assert vote_post.tables["builds"][0]["submission_status"] == Status.PENDING
+    assert bot.deleted == []
+
+
+def test_pending_list_is_capped(postgrest: FakePostgrest, loop: asyncio.AbstractEventLoop):
+    postgrest.seed(PENDING_LIST_SIZE + 5)
+    for build in postgrest.tables["builds"]:
+        build["submission_status"] = Status.PENDING
+    ctx = FakeContext()
+    cog = SubmissionsCog(FakeBot())  # type: ignore[arg-type]
+    round_trips = postgrest.round_trips
+    loop.run_until_complete(SubmissionsCog.get_pending_submissions.callback(cog, ctx))  # type: ignore[arg-type]
+
+    assert ctx.embed is not None and ctx.embed.description is not None
+    entries = ctx.embed.description.split("\n\n")
+    assert len(entries) == PENDING_LIST_SIZE + 1
+    assert entries[-1] == "...and 5 more."
+    # The count and a single page of builds
+    assert postgrest.round_trips - round_trips == 2
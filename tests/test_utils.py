@@ -0,0 +1,118 @@
+"""Tests of the streaming catbox uploads in `database.utils`, against a local stand-in for catbox and Discord's CDN."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from typing import Any
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from database.utils import UPLOAD_CHUNK_SIZE, stream_url, upload_to_catbox
+
+VIDEO = bytes(range(256)) * (3 * UPLOAD_CHUNK_SIZE // 256) + b"tail"
+"""A file a bit larger than three chunks."""
+
+
+class Catbox:
+    """A stand-in for the catbox API, which records the uploads it receives, and for the CDN serving `VIDEO`."""
+
+    def __init__(self):
+        self.uploads: list[dict[str, Any]] = []
+        self.app = web.Application()
+        self.app.router.add_get("/video.mp4", self.download)
+        self.app.router.add_post("/user/api.php", self.upload)
+        self.app.router.add_post("/full/api.php", self.reject)
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "video/mp4"})
+        await response.prepare(request)
+        for i in range(0, len(VIDEO), 10_000):
+            await response.write(VIDEO[i : i + 10_000])
+        await response.write_eof()
+        return response
+
+    async def upload(self, request: web.Request) -> web.Response:
+        upload: dict[str, Any] = {"transfer_encoding": request.headers.get("Transfer-Encoding"), "fields": {}}
+        reader = await request.multipart()
+        while (part := await reader.next()) is not None:
+            assert isinstance(part, aiohttp.BodyPartReader)
+            if part.name == "fileToUpload":
+                upload.update(filename=part.filename, content_type=part.headers["Content-Type"], file=await part.read())
+            else:
+                upload["fields"][part.name] = await part.text()
+        self.uploads.append(upload)
+        return web.Response(text=f"https://files.catbox.moe/{upload['filename']}\n")
+
+    async def reject(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.Response(status=412, text="No files given.")
+
+
+@pytest.fixture
+def catbox(loop: asyncio.AbstractEventLoop) -> Iterator[tuple[Catbox, TestServer]]:
+    stand_in = Catbox()
+    server = TestServer(stand_in.app, loop=loop)
+    loop.run_until_complete(server.start_server())
+    yield stand_in, server
+    loop.run_until_complete(server.close())
+
+
+def test_streams_download_to_catbox(catbox: tuple[Catbox, TestServer], loop: asyncio.AbstractEventLoop):
+    stand_in, server = catbox
+    chunk_sizes: list[int] = []
+
+    async def upload() -> str:
+        async with aiohttp.ClientSession() as session:
+
+            async def chunks():
+                async for chunk in stream_url(session, str(server.make_url("/video.mp4"))):
+                    chunk_sizes.append(len(chunk))
+                    yield chunk
+
+            return await upload_to_catbox(
+                "video.mp4", chunks(), "video/mp4", session=session, url=str(server.make_url("/user/api.php"))
+            )
+
+    assert loop.run_until_complete(upload()) == "https://files.catbox.moe/video.mp4"
+    assert max(chunk_sizes) <= UPLOAD_CHUNK_SIZE
+    [received] = stand_in.uploads
+    # The body is sent as it is read, so its length is not known up front
+    assert received["transfer_encoding"] == "chunked"
+    assert received["fields"] == {"reqtype": "fileupload"}
+    assert (received["filename"], received["content_type"]) == ("video.mp4", "video/mp4")
+    assert received["file"] == VIDEO
+
+
+def test_catbox_url_from_environment(
+    catbox: tuple[Catbox, TestServer], loop: asyncio.AbstractEventLoop, monkeypatch: pytest.MonkeyPatch
+):
+    stand_in, server = catbox
+    monkeypatch.setenv("CATBOX_URL", str(server.make_url("/user/api.php")))
+    monkeypatch.setenv("CATBOX_USERHASH", "hash")
+
+    async def upload() -> str:
+        async with aiohttp.ClientSession() as session:
+            return await upload_to_catbox("image.png", b"png", "image/png", session=session)
+
+    assert loop.run_until_complete(upload()) == "https://files.catbox.moe/image.png"
+    [received] = stand_in.uploads
+    assert received["fields"] == {"reqtype": "fileupload", "userhash": "hash"}
+    assert received["file"] == b"png"
+
+
+def test_rejected_upload_raises(catbox: tuple[Catbox, TestServer], loop: asyncio.AbstractEventLoop):
+    _, server = catbox
+
+    async def upload() -> str:
+        async with aiohttp.ClientSession() as session:
+            return await upload_to_catbox(
+                "image.png", b"png", "image/png", session=session, url=str(server.make_url("/full/api.php"))
+            )
+
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        loop.run_until_complete(upload())
+    assert error.value.status == 412